@@ -119,6 +119,7 @@ celery = Celery(
     backend=app.config['RESULT_BACKEND']
 )
 celery.conf.update(app.config)
+celery.conf.broker_transport_options = {'visibility_timeout': app.config['CELERY_VISIBILITY_TIMEOUT']}
 
 # The prefetch_multiplier line has been removed.
 
@@ -135,4 +136,5 @@ if not app.config['PRODUCTION']:
 
 # Import routes and tasks AFTER app and celery are defined
 from app import routes
-from app import tasks
\ No newline at end of file
+from app import tasks
+from app import commands
\ No newline at end of file
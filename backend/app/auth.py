@@ -1,10 +1,14 @@
 import os
 import json
+import time
+import threading
 import logging
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from flask import session
 import googleapiclient.discovery
+from googleapiclient import discovery_cache
+import requests
 from app import app
 
 logger = logging.getLogger(__name__)
@@ -16,6 +20,13 @@ SCOPES = [
 ]
 API_SERVICE_NAME = 'youtube'
 API_VERSION = 'v3'
+DISCOVERY_URL = f"https://www.googleapis.com/discovery/v1/apis/{API_SERVICE_NAME}/{API_VERSION}/rest"
+
+# The parsed discovery document is shared by every client in the process;
+# build() would re-read and re-parse it (or fetch it) on each call.
+_discovery_document = None
+_discovery_lock = threading.Lock()
+_client_build_stats = {"discovery_load_ms": None, "discovery_source": None, "builds": 0, "last_build_ms": None}
 
 
 def get_client_config():
@@ -90,14 +101,47 @@ def get_credentials():
     return credentials
 
 
+def get_discovery_document():
+    """Load the YouTube discovery document once per process, preferring the bundled static copy."""
+    global _discovery_document
+    if _discovery_document is not None:
+        return _discovery_document
+
+    with _discovery_lock:
+        if _discovery_document is None:
+            start = time.perf_counter()
+            document = discovery_cache.get_static_doc(API_SERVICE_NAME, API_VERSION)
+            source = "static"
+            if document is None:
+                response = requests.get(DISCOVERY_URL, timeout=10)
+                response.raise_for_status()
+                document = response.text
+                source = "remote"
+            _discovery_document = json.loads(document)
+            _client_build_stats["discovery_load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            _client_build_stats["discovery_source"] = source
+            logger.info(f"Loaded {source} discovery document in {_client_build_stats['discovery_load_ms']}ms")
+    return _discovery_document
+
+
+def build_client_for_credentials(credentials):
+    """Bind credentials to a YouTube client built from the cached discovery document."""
+    document = get_discovery_document()
+    start = time.perf_counter()
+    client = googleapiclient.discovery.build_from_document(document, credentials=credentials)
+    _client_build_stats["builds"] += 1
+    _client_build_stats["last_build_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return client
+
+
+def get_client_build_stats():
+    return dict(_client_build_stats)
+
+
 def build_youtube_client():
     """Build and return a YouTube API client."""
     credentials = get_credentials()
     if not credentials:
         return None
 
-    return googleapiclient.discovery.build(
-        API_SERVICE_NAME,
-        API_VERSION,
-        credentials=credentials
-    )
+    return build_client_for_credentials(credentials)
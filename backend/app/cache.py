@@ -0,0 +1,334 @@
+import gzip
+import hashlib
+import json
+import time
+
+import redis
+from googleapiclient.errors import HttpError
+
+from app import app, logger, redis_conn
+
+# Key prefixes (kept next to TASK_KEY_PREFIX style used in routes)
+GENERATION_KEY_PREFIX = "yts_gen:"
+SEARCH_KEY_PREFIX = "yts_search:"
+SEARCH_LRU_KEY_PREFIX = "yts_search_lru:"
+SEARCH_STATS_KEY = "yts_search_cache_stats"
+CHANNELS_KEY_PREFIX = "yts_channels:"
+CHANNELS_TTL = 7 * 24 * 3600
+TRANSCRIPT_KEY_PREFIX = "yts_transcript:"
+TRANSCRIPT_INDEX_KEY = "yts_transcript_index"
+TRANSCRIPT_SIZES_KEY = "yts_transcript_sizes"
+TRANSCRIPT_BYTES_KEY = "yts_transcript_bytes"
+TRANSCRIPT_STATS_KEY = "yts_transcript_cache_stats"
+YOUTUBE_KEY_PREFIX = "yts_yt:"
+YOUTUBE_STATS_KEY = "yts_yt_cache_stats"
+
+# Transcripts are stored compressed, so they need a connection that does not
+# decode responses (redis_conn does).
+_binary_redis = None
+
+
+def get_index_generation(playlist_id):
+    """Current generation of a playlist's index; cache keys embed it."""
+    if redis_conn is None:
+        return 0
+    try:
+        return int(redis_conn.get(f"{GENERATION_KEY_PREFIX}{playlist_id}") or 0)
+    except Exception as e:
+        logger.warning(f"Could not read index generation for {playlist_id}: {e}")
+        return 0
+
+
+def bump_index_generation(playlist_id):
+    """
+    Invalidate every cached search for a playlist by moving it to a new
+    generation. Old entries become unreachable and are dropped right away.
+    """
+    if redis_conn is None:
+        return 0
+    try:
+        generation = redis_conn.incr(f"{GENERATION_KEY_PREFIX}{playlist_id}")
+        lru_key = f"{SEARCH_LRU_KEY_PREFIX}{playlist_id}"
+        stale_keys = redis_conn.zrange(lru_key, 0, -1)
+        pipe = redis_conn.pipeline()
+        if stale_keys:
+            pipe.delete(*stale_keys)
+        pipe.delete(lru_key)
+        pipe.execute()
+        return generation
+    except Exception as e:
+        logger.warning(f"Could not bump index generation for {playlist_id}: {e}")
+        return 0
+
+
+def _search_cache_key(playlist_id, generation, query, search_in, channels, page, size):
+    normalized = {
+        "q": " ".join(query.split()),
+        "fields": sorted(set(search_in or [])),
+        "channels": sorted(set(channels or [])),
+        "page": page,
+        "size": size
+    }
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{SEARCH_KEY_PREFIX}{playlist_id}:{generation}:{digest}"
+
+
+def get_cached_search(playlist_id, query, search_in, channels, page, size):
+    """Return a cached search response or None, counting hits and misses."""
+    if redis_conn is None or not app.config['SEARCH_CACHE_ENABLED']:
+        return None
+    try:
+        generation = get_index_generation(playlist_id)
+        key = _search_cache_key(playlist_id, generation, query, search_in, channels, page, size)
+        payload = redis_conn.get(key)
+        pipe = redis_conn.pipeline()
+        if payload is None:
+            pipe.hincrby(SEARCH_STATS_KEY, "misses", 1)
+            pipe.execute()
+            return None
+        # Touch the entry so eviction drops the least recently used ones first
+        pipe.hincrby(SEARCH_STATS_KEY, "hits", 1)
+        pipe.zadd(f"{SEARCH_LRU_KEY_PREFIX}{playlist_id}", {key: time.time()})
+        pipe.expire(key, app.config['SEARCH_CACHE_TTL'])
+        pipe.execute()
+        return json.loads(payload)
+    except Exception as e:
+        logger.warning(f"Search cache read failed: {e}")
+        return None
+
+
+def set_cached_search(playlist_id, query, search_in, channels, page, size, results):
+    """Store a search response and evict the least recently used entries over the limit."""
+    if redis_conn is None or not app.config['SEARCH_CACHE_ENABLED']:
+        return
+    try:
+        generation = get_index_generation(playlist_id)
+        key = _search_cache_key(playlist_id, generation, query, search_in, channels, page, size)
+        lru_key = f"{SEARCH_LRU_KEY_PREFIX}{playlist_id}"
+        ttl = app.config['SEARCH_CACHE_TTL']
+
+        pipe = redis_conn.pipeline()
+        pipe.set(key, json.dumps(results), ex=ttl)
+        pipe.zadd(lru_key, {key: time.time()})
+        pipe.expire(lru_key, ttl)
+        pipe.zcard(lru_key)
+        entries = pipe.execute()[-1]
+
+        overflow = entries - app.config['SEARCH_CACHE_MAX_ENTRIES']
+        if overflow > 0:
+            evicted = [member for member, _ in redis_conn.zpopmin(lru_key, overflow)]
+            if evicted:
+                redis_conn.delete(*evicted)
+                redis_conn.hincrby(SEARCH_STATS_KEY, "evictions", len(evicted))
+    except Exception as e:
+        logger.warning(f"Search cache write failed: {e}")
+
+
+def get_cached_channels(playlist_id):
+    """Channel facets of the playlist's current index generation, or None."""
+    if redis_conn is None:
+        return None
+    try:
+        generation = get_index_generation(playlist_id)
+        payload = redis_conn.get(f"{CHANNELS_KEY_PREFIX}{playlist_id}:{generation}")
+        return json.loads(payload) if payload is not None else None
+    except Exception as e:
+        logger.warning(f"Channel cache read failed: {e}")
+        return None
+
+
+def set_cached_channels(playlist_id, channels):
+    """Store channel facets under the current generation; a bump makes them unreachable."""
+    if redis_conn is None:
+        return
+    try:
+        generation = get_index_generation(playlist_id)
+        redis_conn.set(f"{CHANNELS_KEY_PREFIX}{playlist_id}:{generation}", json.dumps(channels), ex=CHANNELS_TTL)
+    except Exception as e:
+        logger.warning(f"Channel cache write failed: {e}")
+
+
+def get_search_cache_stats():
+    """Hit/miss/eviction counters for sizing the search cache."""
+    if redis_conn is None:
+        return {"error": "Redis is not connected"}
+    stats = {k: int(v) for k, v in (redis_conn.hgetall(SEARCH_STATS_KEY) or {}).items()}
+    hits = stats.get("hits", 0)
+    misses = stats.get("misses", 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "evictions": stats.get("evictions", 0),
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "ttl_seconds": app.config['SEARCH_CACHE_TTL'],
+        "max_entries_per_playlist": app.config['SEARCH_CACHE_MAX_ENTRIES']
+    }
+
+
+def _get_binary_redis():
+    global _binary_redis
+    if _binary_redis is None:
+        _binary_redis = redis.from_url(app.config['REDIS_URL'])
+    return _binary_redis
+
+
+def _transcript_key(video_id, language):
+    return f"{TRANSCRIPT_KEY_PREFIX}{language}:{video_id}"
+
+
+def get_cached_transcript(video_id, language="en"):
+    """
+    Look up a transcript in the shared cache.
+    Returns (found, segments); a cached "no transcript" result is (True, []).
+    """
+    if not app.config['TRANSCRIPT_CACHE_ENABLED']:
+        return False, None
+    try:
+        payload = _get_binary_redis().get(_transcript_key(video_id, language))
+        if payload is None:
+            redis_conn.hincrby(TRANSCRIPT_STATS_KEY, "misses", 1)
+            return False, None
+        entry = json.loads(gzip.decompress(payload).decode('utf-8'))
+        redis_conn.hincrby(TRANSCRIPT_STATS_KEY, "negative_hits" if entry.get("status") == "none" else "hits", 1)
+        return True, entry.get("segments", [])
+    except Exception as e:
+        logger.warning(f"Transcript cache read failed for {video_id}: {e}")
+        return False, None
+
+
+def set_cached_transcript(video_id, segments, language="en", negative=False):
+    """
+    Store a transcript (or a negative result, with the shorter TTL) and
+    evict the oldest entries while the cache is over TRANSCRIPT_CACHE_MAX_BYTES.
+    """
+    if not app.config['TRANSCRIPT_CACHE_ENABLED']:
+        return
+    try:
+        client = _get_binary_redis()
+        key = _transcript_key(video_id, language)
+        entry = {"status": "none" if negative else "ok", "segments": [] if negative else segments}
+        payload = gzip.compress(json.dumps(entry, separators=(",", ":")).encode('utf-8'))
+        ttl = app.config['TRANSCRIPT_CACHE_NEGATIVE_TTL'] if negative else app.config['TRANSCRIPT_CACHE_TTL']
+
+        previous_size = client.hget(TRANSCRIPT_SIZES_KEY, key)
+        pipe = client.pipeline()
+        pipe.set(key, payload, ex=ttl)
+        pipe.zadd(TRANSCRIPT_INDEX_KEY, {key: time.time()})
+        pipe.hset(TRANSCRIPT_SIZES_KEY, key, len(payload))
+        pipe.incrby(TRANSCRIPT_BYTES_KEY, len(payload) - int(previous_size or 0))
+        total_bytes = pipe.execute()[-1]
+
+        if total_bytes > app.config['TRANSCRIPT_CACHE_MAX_BYTES']:
+            _evict_transcripts(client, total_bytes)
+    except Exception as e:
+        logger.warning(f"Transcript cache write failed for {video_id}: {e}")
+
+
+def _evict_transcripts(client, total_bytes, batch=50):
+    """Drop the oldest transcripts until the cache fits its byte budget again."""
+    limit = app.config['TRANSCRIPT_CACHE_MAX_BYTES']
+    evicted = 0
+    while total_bytes > limit:
+        oldest = [member for member, _ in client.zpopmin(TRANSCRIPT_INDEX_KEY, batch)]
+        if not oldest:
+            # Index is empty but the counter is not; it drifted, so reset it
+            client.set(TRANSCRIPT_BYTES_KEY, 0)
+            break
+        sizes = client.hmget(TRANSCRIPT_SIZES_KEY, oldest)
+        freed = sum(int(size or 0) for size in sizes)
+        pipe = client.pipeline()
+        pipe.delete(*oldest)
+        pipe.hdel(TRANSCRIPT_SIZES_KEY, *oldest)
+        pipe.decrby(TRANSCRIPT_BYTES_KEY, freed)
+        total_bytes = pipe.execute()[-1]
+        evicted += len(oldest)
+    if evicted:
+        redis_conn.hincrby(TRANSCRIPT_STATS_KEY, "evictions", evicted)
+
+
+def get_transcript_cache_stats():
+    """Hit/miss counters and current size of the transcript cache."""
+    if redis_conn is None:
+        return {"error": "Redis is not connected"}
+    stats = {k: int(v) for k, v in (redis_conn.hgetall(TRANSCRIPT_STATS_KEY) or {}).items()}
+    hits = stats.get("hits", 0) + stats.get("negative_hits", 0)
+    lookups = hits + stats.get("misses", 0)
+    return {
+        **stats,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "entries": redis_conn.zcard(TRANSCRIPT_INDEX_KEY),
+        "bytes": int(redis_conn.get(TRANSCRIPT_BYTES_KEY) or 0),
+        "max_bytes": app.config['TRANSCRIPT_CACHE_MAX_BYTES']
+    }
+
+
+def _youtube_cache_key(request, scope):
+    digest = hashlib.sha1(f"{scope}|{request.method}|{request.uri}".encode('utf-8')).hexdigest()
+    return f"{YOUTUBE_KEY_PREFIX}{digest}"
+
+
+def execute_with_etag(request, scope=""):
+    """
+    Execute a googleapiclient list request, revalidating a cached response
+    with its ETag. A 304 returns the cached body without re-downloading it.
+
+    The request URI (including pageToken) identifies the response; `scope`
+    must separate callers whose identical URIs return different data, e.g.
+    mine=True requests for different users. Cached bodies are only served
+    after the API confirms them for the caller, so they never bypass auth.
+    """
+    if not app.config['YOUTUBE_CACHE_ENABLED'] or redis_conn is None:
+        return request.execute()
+
+    key = _youtube_cache_key(request, scope)
+    cached = None
+    try:
+        raw = redis_conn.get(key)
+        if raw:
+            cached = json.loads(raw)
+            etag = cached["etag"]
+            request.headers["If-None-Match"] = etag if etag.startswith('"') else f'"{etag}"'
+    except Exception as e:
+        logger.warning(f"YouTube cache read failed: {e}")
+        cached = None
+
+    try:
+        response = request.execute()
+    except HttpError as e:
+        if cached is not None and e.resp.status == 304:
+            try:
+                pipe = redis_conn.pipeline()
+                pipe.expire(key, app.config['YOUTUBE_CACHE_TTL'])
+                pipe.hincrby(YOUTUBE_STATS_KEY, "not_modified", 1)
+                pipe.execute()
+            except Exception:
+                pass
+            return cached["body"]
+        raise
+
+    try:
+        pipe = redis_conn.pipeline()
+        if response.get("etag"):
+            pipe.set(key, json.dumps({"etag": response["etag"], "body": response}), ex=app.config['YOUTUBE_CACHE_TTL'])
+        pipe.hincrby(YOUTUBE_STATS_KEY, "changed" if cached is not None else "misses", 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"YouTube cache write failed: {e}")
+    return response
+
+
+def get_youtube_cache_stats():
+    """How often YouTube listings were served from a 304 revalidation."""
+    if redis_conn is None:
+        return {"error": "Redis is not connected"}
+    stats = {k: int(v) for k, v in (redis_conn.hgetall(YOUTUBE_STATS_KEY) or {}).items()}
+    not_modified = stats.get("not_modified", 0)
+    lookups = not_modified + stats.get("changed", 0) + stats.get("misses", 0)
+    return {
+        "not_modified": not_modified,
+        "changed": stats.get("changed", 0),
+        "misses": stats.get("misses", 0),
+        "hit_rate": round(not_modified / lookups, 4) if lookups else 0.0,
+        "ttl_seconds": app.config['YOUTUBE_CACHE_TTL']
+    }
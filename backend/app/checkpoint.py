@@ -0,0 +1,159 @@
+import json
+import time
+
+from app import logger, redis_conn
+
+JOB_KEY_PREFIX = "yts_job:"
+CHECKPOINT_TTL = 7 * 24 * 3600
+
+
+def _key(playlist_id, part):
+    return f"{JOB_KEY_PREFIX}{playlist_id}:{part}"
+
+
+def save_checkpoint(playlist_id, videos, videos_to_fetch, skipped_count, incremental, extra=None):
+    """
+    Persist the plan of an indexing run: the full listing, the videos that
+    still need a transcript fetch and the counters computed while listing.
+    Completed and failed IDs are tracked separately as the run progresses
+    (work dispatched during a streamed listing may already have finished),
+    so callers clear the previous run's checkpoint before starting a new one.
+    """
+    if redis_conn is None:
+        return
+    try:
+        meta = {
+            "incremental": int(bool(incremental)),
+            "listing": 0,
+            "skipped": skipped_count,
+            "created_at": time.time(),
+            "extra": json.dumps(extra or {})
+        }
+        pipe = redis_conn.pipeline()
+        pipe.hset(_key(playlist_id, "meta"), mapping=meta)
+        pipe.set(_key(playlist_id, "videos"), json.dumps(videos))
+        pipe.set(_key(playlist_id, "pending"), json.dumps(videos_to_fetch))
+        for part in ("meta", "videos", "pending"):
+            pipe.expire(_key(playlist_id, part), CHECKPOINT_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not save checkpoint for {playlist_id}: {e}")
+
+
+def save_listing_checkpoint(playlist_id, incremental):
+    """
+    Mark a run whose listing is still in progress. Transcript work is
+    dispatched page by page, so a run interrupted while listing has already
+    written to the index; the next run must resume into it, not recreate it.
+    save_checkpoint replaces the marker once the listing is complete.
+    """
+    if redis_conn is None:
+        return
+    try:
+        meta = {
+            "incremental": int(bool(incremental)),
+            "listing": 1,
+            "created_at": time.time()
+        }
+        pipe = redis_conn.pipeline()
+        pipe.hset(_key(playlist_id, "meta"), mapping=meta)
+        pipe.expire(_key(playlist_id, "meta"), CHECKPOINT_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not save listing checkpoint for {playlist_id}: {e}")
+
+
+def load_checkpoint(playlist_id):
+    """
+    The saved plan of an unfinished run, or None. Returns
+    {"listing": False, "videos", "pending" (not yet completed), "done", "failed",
+    "skipped", "incremental", "extra"}, or {"listing": True, "incremental", "done"}
+    for a run interrupted before its listing was complete.
+    """
+    if redis_conn is None:
+        return None
+    try:
+        meta = redis_conn.hgetall(_key(playlist_id, "meta"))
+        if meta.get("listing") == "1":
+            return {
+                "listing": True,
+                "incremental": meta.get("incremental") == "1",
+                "done": redis_conn.smembers(_key(playlist_id, "done"))
+            }
+        videos = redis_conn.get(_key(playlist_id, "videos"))
+        pending = redis_conn.get(_key(playlist_id, "pending"))
+        if not meta or videos is None or pending is None:
+            return None
+        done = redis_conn.smembers(_key(playlist_id, "done"))
+        failed = redis_conn.smembers(_key(playlist_id, "failed"))
+        return {
+            "listing": False,
+            "videos": json.loads(videos),
+            "pending": [video for video in json.loads(pending) if video['id'] not in done and video['id'] not in failed],
+            "done": done,
+            "failed": failed,
+            "skipped": int(meta.get("skipped", 0)),
+            "incremental": meta.get("incremental") == "1",
+            "extra": json.loads(meta.get("extra") or "{}")
+        }
+    except Exception as e:
+        logger.warning(f"Could not load checkpoint for {playlist_id}: {e}")
+        return None
+
+
+def clear_checkpoint(playlist_id, dead_letters=False):
+    """Forget a run's plan and progress. Dead letters are kept unless asked."""
+    if redis_conn is None:
+        return
+    parts = ["meta", "videos", "pending", "done", "failed"]
+    if dead_letters:
+        parts.append("dead")
+    redis_conn.delete(*[_key(playlist_id, part) for part in parts])
+
+
+def mark_videos_done(playlist_id, video_ids):
+    if redis_conn is None or not playlist_id or not video_ids:
+        return
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.sadd(_key(playlist_id, "done"), *video_ids)
+        pipe.expire(_key(playlist_id, "done"), CHECKPOINT_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not checkpoint videos for {playlist_id}: {e}")
+
+
+def add_dead_letters(playlist_id, failures):
+    """Record videos that exhausted their retries, [(video_data, error), ...]."""
+    if redis_conn is None or not playlist_id or not failures:
+        return
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.sadd(_key(playlist_id, "failed"), *[video['id'] for video, _ in failures])
+        pipe.expire(_key(playlist_id, "failed"), CHECKPOINT_TTL)
+        for video, error in failures:
+            pipe.rpush(_key(playlist_id, "dead"), json.dumps({
+                "video": video,
+                "error": str(error),
+                "failed_at": time.time()
+            }))
+        pipe.expire(_key(playlist_id, "dead"), CHECKPOINT_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record dead letters for {playlist_id}: {e}")
+
+
+def get_dead_letters(playlist_id):
+    if redis_conn is None:
+        return []
+    return [json.loads(item) for item in redis_conn.lrange(_key(playlist_id, "dead"), 0, -1)]
+
+
+def drop_dead_letters(playlist_id, count):
+    """
+    Remove the first count dead letters once a retry run has re-queued them.
+    Videos that fail again are appended behind them and stay.
+    """
+    if redis_conn is None or count <= 0:
+        return
+    redis_conn.ltrim(_key(playlist_id, "dead"), count, -1)
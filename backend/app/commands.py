@@ -0,0 +1,78 @@
+import click
+
+from app import app, es
+from app.elastic import migrate_to_segment_storage, migrate_to_shared_layout, backfill_transcript_windows, storage_report, get_playlist_index
+
+
+def _playlist_indexes(playlist_ids, all_playlists):
+    """Resolve CLI arguments to legacy (concrete) playlist index names."""
+    if all_playlists:
+        indices = es.indices.get(index="playlist_*")
+        indices = indices.body if hasattr(indices, 'body') else dict(indices)
+        # Shared-layout aliases resolve to yts_videos_<n>; keep concrete playlist indexes only
+        return sorted(name for name in indices.keys() if name.startswith("playlist_"))
+    return [get_playlist_index(playlist_id) for playlist_id in playlist_ids]
+
+
+@app.cli.command('migrate-segments')
+@click.argument('playlist_ids', nargs=-1)
+@click.option('--all', 'all_playlists', is_flag=True, help='Migrate every playlist_* index.')
+@click.option('--window', type=int, default=None, help='Segments per flat document (defaults to SEGMENT_WINDOW_SIZE).')
+def migrate_segments(playlist_ids, all_playlists, window):
+    """Move nested transcript segments into flat segment indexes."""
+    index_names = _playlist_indexes(playlist_ids, all_playlists)
+    if not index_names:
+        raise click.UsageError("Pass one or more playlist IDs or --all")
+
+    for index_name in index_names:
+        try:
+            written = migrate_to_segment_storage(index_name, window)
+            click.echo(f"{index_name}: {written} segment documents")
+        except Exception as e:
+            click.echo(f"{index_name}: migration failed: {e}", err=True)
+
+
+@app.cli.command('migrate-shared')
+@click.argument('playlist_ids', nargs=-1)
+@click.option('--all', 'all_playlists', is_flag=True, help='Migrate every per-playlist index.')
+def migrate_shared(playlist_ids, all_playlists):
+    """Move per-playlist indexes into the shared routed indexes behind aliases."""
+    index_names = _playlist_indexes(playlist_ids, all_playlists)
+    if not index_names:
+        raise click.UsageError("Pass one or more playlist IDs or --all")
+
+    for index_name in index_names:
+        try:
+            moved = migrate_to_shared_layout(index_name)
+            click.echo(f"{index_name}: {moved} videos moved")
+        except Exception as e:
+            click.echo(f"{index_name}: migration failed: {e}", err=True)
+
+
+@app.cli.command('backfill-windows')
+@click.argument('playlist_ids', nargs=-1)
+@click.option('--all', 'all_playlists', is_flag=True, help='Backfill every per-playlist index.')
+def backfill_windows(playlist_ids, all_playlists):
+    """Map transcript_windows on existing indexes and build windows for older documents."""
+    index_names = _playlist_indexes(playlist_ids, all_playlists)
+    if not index_names:
+        raise click.UsageError("Pass one or more playlist IDs or --all")
+
+    for index_name in index_names:
+        try:
+            updated = backfill_transcript_windows(index_name)
+            click.echo(f"{index_name}: {updated} documents updated")
+        except Exception as e:
+            click.echo(f"{index_name}: backfill failed: {e}", err=True)
+
+
+@app.cli.command('storage-report')
+@click.argument('playlist_id')
+@click.option('--sample', type=int, default=500, help='Number of videos to sample.')
+def storage_report_command(playlist_id, sample):
+    """Compare on-disk size of the standard and compact mapping profiles on a sample playlist."""
+    report = storage_report(get_playlist_index(playlist_id), sample)
+    click.echo(f"{report['index']}: {report['documents']} sampled videos")
+    for profile in ("standard", "compact"):
+        click.echo(f"  {profile:<9} store={report[profile]['store_bytes']:>12,} B  _source={report[profile]['source_bytes']:>12,} B")
+    click.echo(f"  saved: {report['store_bytes_saved_pct']}% on disk, {report['source_bytes_saved_pct']}% of _source")
@@ -0,0 +1,43 @@
+import json
+import secrets
+
+from app import app, logger, redis_conn
+
+CURSOR_KEY_PREFIX = "yts_cursor:"
+
+
+def _key(token):
+    return f"{CURSOR_KEY_PREFIX}{token}"
+
+
+def save_cursor(state):
+    """
+    Store the state of a paged search (playlist, query, point in time and
+    search_after values) under a new opaque token and return the token.
+    The entry expires together with the point in time it refers to.
+    """
+    if redis_conn is None:
+        return None
+    try:
+        token = secrets.token_urlsafe(16)
+        redis_conn.set(_key(token), json.dumps(state), ex=app.config['SEARCH_CURSOR_TTL'])
+        return token
+    except Exception as e:
+        logger.warning(f"Could not save search cursor: {e}")
+        return None
+
+
+def load_cursor(token):
+    """
+    The state saved under a cursor token, or None if it is unknown or has
+    expired. Tokens stay valid until they expire so a page can be retried;
+    each page hands out a new token for the next one.
+    """
+    if redis_conn is None or not token:
+        return None
+    try:
+        payload = redis_conn.get(_key(token))
+        return json.loads(payload) if payload is not None else None
+    except Exception as e:
+        logger.warning(f"Could not load search cursor: {e}")
+        return None
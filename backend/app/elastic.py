@@ -1,73 +1,333 @@
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import scan  # <--- Added this import
+from elasticsearch.helpers import scan, streaming_bulk, bulk
+import bisect
+from collections import Counter
 import json
+import re
+import threading
+import zlib
+import time
 from datetime import datetime
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
-from app import es
+from app import app, es
+from app.windows import build_transcript_windows, window_owns_match
 
-def create_index(index_name, recreate=False):
-    """Create an index with the proper mapping and increased limits."""
-    mapping = {
-        "settings": {
-            "index": {
-                "number_of_shards": 1,
-                "number_of_replicas": 0,
-                "mapping": {
-                    "nested_objects": {
-                        "limit": 100000
-                    }
-                }
-            }
-        },
-        "mappings": {
-            "properties": {
-                "video_id": {"type": "keyword"},
-                "title": {"type": "text"},
-                "description": {"type": "text"},
-                "channel": {"type": "keyword"},
-                "published_at": {"type": "date"},
-                "view_count": {"type": "long"},
-                "thumbnail": {"type": "keyword"},
-                "transcript_full_text": {"type": "text"},
-                "transcript_segments": {
-                    "type": "nested",
+SEGMENT_INDEX_MAPPING = {
+    "settings": {
+        "index": {
+            "number_of_shards": 1,
+            "number_of_replicas": 0
+        }
+    },
+    "mappings": {
+        "properties": {
+            "video_id": {"type": "keyword"},
+            "position": {"type": "integer"},
+            "text": {"type": "text"},
+            "start": {"type": "float"},
+            "duration": {"type": "float"}
+        }
+    }
+}
+
+# Segment timings are only ever read back from _source, never queried
+COMPACT_TIMING = {"type": "float", "index": False, "doc_values": False}
+
+def _timed_text_mapping(compact=False, copy_to=None):
+    """Nested mapping for timed transcript text (segments or windows)."""
+    timing = COMPACT_TIMING if compact else {"type": "float"}
+    text = {"type": "text"}
+    if copy_to:
+        text["copy_to"] = copy_to
+    return {
+        "type": "nested",
+        "properties": {"text": text, "start": dict(timing), "duration": dict(timing)}
+    }
+
+def _window_mapping(compact=False):
+    """Nested transcript_windows; owned_chars is only read back from _source."""
+    mapping = _timed_text_mapping(compact)
+    mapping["properties"]["owned_chars"] = {"type": "integer", "index": False, "doc_values": False}
+    return mapping
+
+def _compact_profile():
+    return app.config['INDEX_MAPPING_PROFILE'] == "compact"
+
+def segment_index_name(index_name):
+    """Name of the flat segment index that belongs to a playlist index."""
+    return index_name.replace("playlist_", "segments_", 1)
+
+# index_name -> (layout, checked_at); avoids exists() calls per video
+_index_layout_cache = {}
+_LAYOUT_CACHE_TTL = 60
+
+def get_playlist_index(playlist_id):
+    """
+    Single resolver for a playlist's index name. In the per-playlist layout
+    this is a concrete index; in the shared layout it is a filtered, routed
+    alias over one of the shared yts_videos_<n> indexes.
+    """
+    return f"playlist_{playlist_id.lower()}"
+
+def playlist_key(index_name):
+    """Routing/filter key of a playlist index or alias (the lowercased playlist ID)."""
+    return index_name.replace("playlist_", "", 1)
+
+def shared_index_names(index_name):
+    """Shared (video, segment) indexes a playlist is routed to in the shared layout."""
+    shard_group = zlib.crc32(playlist_key(index_name).encode('utf-8')) % max(app.config['SHARED_INDEX_COUNT'], 1)
+    return f"yts_videos_{shard_group}", f"yts_segments_{shard_group}"
+
+def _index_layout(index_name):
+    cached = _index_layout_cache.get(index_name)
+    if cached and time.monotonic() - cached[1] < _LAYOUT_CACHE_TTL:
+        return cached[0]
+    try:
+        field_mapping = es.indices.get_field_mapping(
+            index=index_name, fields=["transcript_windows", "transcript_segments.text", "transcript_timeline", "suggest"]
+        )
+        field_mapping = field_mapping.body if hasattr(field_mapping, 'body') else dict(field_mapping)
+        fields = {}
+        for mapping in field_mapping.values():
+            fields.update(mapping.get("mappings", {}))
+        segment_text = fields.get("transcript_segments.text", {}).get("mapping", {}).get("text", {})
+        layout = {
+            "shared": bool(es.indices.exists_alias(name=index_name)),
+            "segments": bool(es.indices.exists(index=segment_index_name(index_name))),
+            "windows": "transcript_windows" in fields,
+            "timeline": "transcript_timeline" in fields,
+            "suggest": "suggest" in fields,
+            # Compact indexes derive transcript_full_text from the segments with copy_to
+            "derived_full_text": bool(segment_text.get("copy_to"))
+        }
+    except Exception as e:
+        print(f"Could not check layout of {index_name}: {e}")
+        return {"shared": False, "segments": False, "windows": False, "timeline": False, "suggest": False, "derived_full_text": False}
+    _index_layout_cache[index_name] = (layout, time.monotonic())
+    return layout
+
+def _forget_index(index_name):
+    _index_layout_cache.pop(index_name, None)
+
+def uses_segment_index(index_name):
+    """True if the playlist keeps its transcript segments in a separate segment index."""
+    return _index_layout(index_name)["segments"]
+
+def uses_transcript_windows(index_name):
+    """True if the playlist's mapping has the nested transcript_windows field."""
+    layout = _index_layout(index_name)
+    return layout["windows"] and not layout["segments"]
+
+def uses_offset_timeline(index_name):
+    """
+    True if the playlist stores transcripts as transcript_full_text plus an
+    offset -> timestamp timeline instead of nested segments.
+    """
+    layout = _index_layout(index_name)
+    return layout["timeline"] and not layout["segments"]
+
+def is_shared_index(index_name):
+    """True if the playlist name is an alias over a shared index."""
+    return _index_layout(index_name)["shared"]
+
+def document_id(index_name, video_id):
+    """Document _id for a video; shared indexes prefix it with the playlist key."""
+    if is_shared_index(index_name):
+        return f"{playlist_key(index_name)}:{video_id}"
+    return video_id
+
+def _video_index_mapping(storage, compact=None, match_mode=None):
+    """
+    Mapping for a playlist index; nested segments are only mapped in 'nested'
+    storage. The compact profile (INDEX_MAPPING_PROFILE) keeps the transcript
+    text in _source once: transcript_full_text is filled from the segments
+    with copy_to instead of being sent, and unqueried fields (timings,
+    thumbnail) are neither indexed nor given doc values.
+    """
+    compact = _compact_profile() if compact is None else compact
+    match_mode = match_mode or app.config['TRANSCRIPT_MATCH_MODE']
+    properties = {
+        "video_id": {"type": "keyword"},
+        "title": {"type": "text"},
+        "description": {"type": "text"},
+        # Built at refresh instead of on the first channel aggregation
+        "channel": {"type": "keyword", "eager_global_ordinals": True},
+        "published_at": {"type": "date"},
+        "view_count": {"type": "long"},
+        "thumbnail": {"type": "keyword", "index": False, "doc_values": False} if compact else {"type": "keyword"},
+        "transcript_full_text": {"type": "text"},
+        # Titles and frequent transcript phrases for /suggest; the playlist
+        # context keeps shared indexes from suggesting other playlists' videos
+        "suggest": {
+            "type": "completion",
+            "contexts": [{"name": "playlist", "type": "category"}]
+        }
+    }
+    settings = {
+        "number_of_shards": 1,
+        "number_of_replicas": 0
+    }
+    if storage != "segments" and match_mode == "offsets":
+        # Flat transcript: highlight offsets are mapped back to timestamps
+        # through the _source-only timeline, so no nested documents at all
+        properties["transcript_full_text"] = {"type": "text", "index_options": "offsets"}
+        properties["transcript_timeline"] = {"type": "object", "enabled": False}
+    elif storage != "segments":
+        if app.config['TRANSCRIPT_WINDOW_SECONDS'] > 0:
+            # Only the windows are searched; segments are kept for timings
+            # and export without nested documents of their own
+            properties["transcript_windows"] = _window_mapping(compact)
+            if compact:
+                properties["transcript_segments"] = {
+                    "type": "object",
                     "properties": {
-                        "text": {"type": "text"},
-                        "start": {"type": "float"},
-                        "duration": {"type": "float"}
+                        "text": {"type": "text", "index": False, "copy_to": "transcript_full_text"},
+                        "start": dict(COMPACT_TIMING),
+                        "duration": dict(COMPACT_TIMING)
                     }
                 }
-            }
-        }
-    }
+            else:
+                properties["transcript_segments"] = {"type": "object", "enabled": False}
+        else:
+            properties["transcript_segments"] = _timed_text_mapping(
+                compact, copy_to="transcript_full_text" if compact else None
+            )
+        if compact:
+            # copy_to makes the field multi-valued, one value per caption; no
+            # gap between values keeps phrases across captions matching as in
+            # the joined text of the standard profile
+            properties["transcript_full_text"] = {"type": "text", "position_increment_gap": 0}
+        settings["mapping"] = {"nested_objects": {"limit": 100000}}
+
+    return {"settings": {"index": settings}, "mappings": {"properties": properties}}
+
+def _segment_index_mapping(compact=None):
+    compact = _compact_profile() if compact is None else compact
+    mapping = json.loads(json.dumps(SEGMENT_INDEX_MAPPING))
+    if compact:
+        mapping["mappings"]["properties"]["start"] = dict(COMPACT_TIMING)
+        mapping["mappings"]["properties"]["duration"] = dict(COMPACT_TIMING)
+    return mapping
+
+def _shared_mappings():
+    """Mappings for the shared video and segment indexes (always nested-capable so legacy docs fit)."""
+    shards = app.config['SHARED_INDEX_SHARDS']
+    video_mapping = _video_index_mapping("nested", match_mode="nested")
+    video_mapping["settings"]["index"]["number_of_shards"] = shards
+    video_mapping["mappings"]["properties"]["playlist_key"] = {"type": "keyword"}
+
+    segment_mapping = _segment_index_mapping()
+    segment_mapping["settings"]["index"]["number_of_shards"] = shards
+    segment_mapping["mappings"]["properties"]["playlist_key"] = {"type": "keyword"}
+    return video_mapping, segment_mapping
+
+def _alias_actions(index_name, video_index, seg_index=None):
+    key = playlist_key(index_name)
+    alias_body = {"filter": {"term": {"playlist_key": key}}, "routing": key}
+    actions = [{"add": {"index": video_index, "alias": index_name, **alias_body}}]
+    if seg_index:
+        actions.append({"add": {"index": seg_index, "alias": segment_index_name(index_name), **alias_body}})
+    return actions
+
+def ensure_shared_indexes(index_name, with_segments):
+    """Create the shared indexes a playlist routes to, if they are missing."""
+    video_index, seg_index = shared_index_names(index_name)
+    video_mapping, segment_mapping = _shared_mappings()
+    if not es.indices.exists(index=video_index):
+        es.options(ignore_status=400).indices.create(index=video_index, body=video_mapping)
+        print(f"Created shared index: {video_index}")
+    if with_segments and not es.indices.exists(index=seg_index):
+        es.options(ignore_status=400).indices.create(index=seg_index, body=segment_mapping)
+        print(f"Created shared index: {seg_index}")
+    return video_index, seg_index
+
+def _clear_shared_playlist(index_name):
+    """Delete every document behind a playlist's aliases."""
+    targets = [index_name]
+    if uses_segment_index(index_name):
+        targets.append(segment_index_name(index_name))
+    for target in targets:
+        es.delete_by_query(index=target, body={"query": {"match_all": {}}},
+                           conflicts="proceed", refresh=True, wait_for_completion=True)
+
+def _create_shared_playlist(index_name, storage, recreate):
+    alias_exists = es.indices.exists_alias(name=index_name)
+
+    if alias_exists and recreate:
+        _clear_shared_playlist(index_name)
+        print(f"Cleared shared alias: {index_name}")
+        return True, 0
+
+    if not alias_exists:
+        video_index, seg_index = ensure_shared_indexes(index_name, storage == "segments")
+        es.indices.update_aliases(body={
+            "actions": _alias_actions(index_name, video_index, seg_index if storage == "segments" else None)
+        })
+        _forget_index(index_name)
+        print(f"Created alias {index_name} -> {video_index} (storage={storage})")
+        return True, 0
+
+    existing_count = es.count(index=index_name).get('count', 0)
+    print(f"Using existing alias: {index_name} with {existing_count} documents")
+    return False, existing_count
+
+def create_index(index_name, recreate=False):
+    """Create an index with the proper mapping and increased limits."""
+    storage = app.config['TRANSCRIPT_STORAGE']
+    mapping = _video_index_mapping(storage)
+    segments_index = segment_index_name(index_name)
 
     # Check if index exists
     index_exists = es.indices.exists(index=index_name)
+    shared = is_shared_index(index_name) if index_exists else app.config['INDEX_LAYOUT'] == "shared"
+
+    # Legacy per-playlist index being rebuilt under the shared layout
+    if index_exists and not shared and recreate and app.config['INDEX_LAYOUT'] == "shared":
+        delete_playlist_indexes(index_name)
+        index_exists, shared = False, True
+
+    if shared:
+        return _create_shared_playlist(index_name, storage, recreate)
     
     # Delete index if it exists and recreate is True
     if index_exists and recreate:
         es.indices.delete(index=index_name)
+        es.indices.delete(index=segments_index, ignore_unavailable=True)
         es.indices.create(index=index_name, body=mapping)
-        print(f"Recreated index: {index_name}")
+        if storage == "segments":
+            es.indices.create(index=segments_index, body=_segment_index_mapping())
+        _forget_index(index_name)
+        print(f"Recreated index: {index_name} (storage={storage})")
         return True, 0
     
     # Create new index if it doesn't exist
     elif not index_exists:
         es.indices.create(index=index_name, body=mapping)
-        print(f"Created new index: {index_name}")
+        if storage == "segments" and not es.indices.exists(index=segments_index):
+            es.indices.create(index=segments_index, body=_segment_index_mapping())
+        _forget_index(index_name)
+        print(f"Created new index: {index_name} (storage={storage})")
         return True, 0
     
     # Index exists and we're not recreating it
     else:
         # Update settings for existing index dynamically
+        if not uses_segment_index(index_name):
+            try:
+                es.indices.put_settings(index=index_name, body={
+                    "index.mapping.nested_objects.limit": 100000
+                })
+                print(f"Updated settings for existing index: {index_name}")
+            except Exception as e:
+                print(f"Could not update settings: {e}")
         try:
-            es.indices.put_settings(index=index_name, body={
-                "index.mapping.nested_objects.limit": 100000
+            es.indices.put_mapping(index=index_name, body={
+                "properties": {"channel": {"type": "keyword", "eager_global_ordinals": True}}
             })
-            print(f"Updated settings for existing index: {index_name}")
         except Exception as e:
-            print(f"Could not update settings: {e}")
+            print(f"Could not enable eager global ordinals: {e}")
 
         count_query = {"query": {"match_all": {}}}
         count_result = es.count(index=index_name, body=count_query)
@@ -75,12 +335,242 @@ def create_index(index_name, recreate=False):
         print(f"Using existing index: {index_name} with {existing_count} documents")
         return False, existing_count
 
-def get_indexed_video_ids(index_name):
-    """Get a list of all video IDs already indexed using the Scan API (safe for large datasets)."""
+def delete_playlist_indexes(index_name):
+    """Delete a playlist index together with its segment index, if any."""
+    if is_shared_index(index_name):
+        _clear_shared_playlist(index_name)
+        es.options(ignore_status=404).indices.delete_alias(
+            index="yts_*", name=[index_name, segment_index_name(index_name)]
+        )
+    else:
+        es.indices.delete(index=index_name)
+        es.indices.delete(index=segment_index_name(index_name), ignore_unavailable=True)
+    _forget_index(index_name)
+
+def migrate_to_shared_layout(index_name):
+    """
+    Move a legacy per-playlist index (and its segment index) into the shared
+    indexes with _reindex, then atomically swap the concrete index for a
+    filtered, routed alias of the same name. Returns the number of videos moved.
+    """
+    if not es.indices.exists(index=index_name):
+        raise ValueError(f"Index {index_name} does not exist")
+    if is_shared_index(index_name):
+        print(f"{index_name} already uses the shared layout")
+        return 0
+
+    key = playlist_key(index_name)
+    legacy_segments = segment_index_name(index_name)
+    has_segments = bool(es.indices.exists(index=legacy_segments))
+    video_index, seg_index = ensure_shared_indexes(index_name, has_segments)
+
+    script = {
+        "source": "ctx._id = params.key + ':' + ctx._id; ctx._source.playlist_key = params.key",
+        "lang": "painless",
+        "params": {"key": key}
+    }
+    moved = es.reindex(body={
+        "source": {"index": index_name},
+        "dest": {"index": video_index, "routing": f"={key}"},
+        "script": script
+    }, wait_for_completion=True, refresh=True)
+    if moved.get('failures'):
+        raise RuntimeError(f"Reindex of {index_name} failed: {moved['failures'][:1]}")
+
+    if has_segments:
+        seg_moved = es.reindex(body={
+            "source": {"index": legacy_segments},
+            "dest": {"index": seg_index, "routing": f"={key}"},
+            "script": script
+        }, wait_for_completion=True, refresh=True)
+        if seg_moved.get('failures'):
+            raise RuntimeError(f"Reindex of {legacy_segments} failed: {seg_moved['failures'][:1]}")
+
+    # remove_index + add in one request so readers never see a missing name
+    actions = [{"remove_index": {"index": index_name}}]
+    if has_segments:
+        actions.append({"remove_index": {"index": legacy_segments}})
+    actions.extend(_alias_actions(index_name, video_index, seg_index if has_segments else None))
+    es.indices.update_aliases(body={"actions": actions})
+    _forget_index(index_name)
+
+    print(f"Migrated {index_name} into {video_index} ({moved.get('created', 0)} videos)")
+    return moved.get('created', 0)
+
+def migrate_to_segment_storage(index_name, window_size=None):
+    """
+    Move the nested transcript_segments of an existing playlist index into a
+    flat segment index, then strip them from the video documents.
+    Returns the number of segment documents written.
+    """
+    if not es.indices.exists(index=index_name):
+        raise ValueError(f"Index {index_name} does not exist")
+    if uses_segment_index(index_name):
+        print(f"{index_name} already uses segment storage")
+        return 0
+    if is_shared_index(index_name):
+        raise ValueError(f"{index_name} is a shared-layout alias; set TRANSCRIPT_STORAGE before indexing instead")
+
+    window_size = window_size or app.config['SEGMENT_WINDOW_SIZE']
+    seg_index = segment_index_name(index_name)
+    es.indices.create(index=seg_index, body=_segment_index_mapping())
+
+    def segment_actions():
+        for hit in scan(es, index=index_name, query={"query": {"match_all": {}}},
+                        _source=["video_id", "transcript_segments", "transcript_full_text", "transcript_timeline"], size=200):
+            source = hit.get('_source', {})
+            video_id = source.get('video_id') or hit['_id']
+            for seg_doc in build_segment_documents(video_id, source_transcript_segments(source), window_size):
+                yield {
+                    "_op_type": "index",
+                    "_index": seg_index,
+                    "_id": f"{video_id}_{seg_doc['position']}",
+                    "_source": seg_doc
+                }
+
+    try:
+        written, errors = bulk(es, segment_actions(), chunk_size=2000, raise_on_error=False)
+        if errors:
+            raise RuntimeError(f"{len(errors)} segment documents failed, first: {errors[0]}")
+    except Exception:
+        # Leave the source index untouched so the migration can be re-run
+        es.indices.delete(index=seg_index, ignore_unavailable=True)
+        _forget_index(index_name)
+        raise
+
+    es.update_by_query(
+        index=index_name,
+        body={
+            # transcript_segments is not nested (nor searchable) on windowed indexes
+            "query": {"match_all": {}},
+            "script": {
+                "source": "if (ctx._source.containsKey('transcript_segments')) "
+                          "{ ctx._source.remove('transcript_segments'); ctx._source.remove('transcript_windows'); } "
+                          "else { ctx.op = 'noop'; }",
+                "lang": "painless"
+            }
+        },
+        conflicts="proceed",
+        wait_for_completion=True,
+        refresh=True
+    )
+    es.indices.refresh(index=seg_index)
+    _forget_index(index_name)
+    print(f"Migrated {index_name}: {written} segment documents in {seg_index}")
+    return written
+
+def backfill_transcript_windows(index_name):
+    """
+    Add the transcript_windows mapping to an existing nested-storage index
+    and (re)build the windows of every document, so documents indexed before
+    windows or before owned_chars existed get them.
+    Returns the number of documents updated.
+    """
+    if uses_segment_index(index_name) or uses_offset_timeline(index_name):
+        raise ValueError(f"{index_name} does not use nested storage; windows only apply to nested storage")
+    if app.config['TRANSCRIPT_WINDOW_SECONDS'] <= 0:
+        raise ValueError("TRANSCRIPT_WINDOW_SECONDS is 0; windows are disabled")
+
+    es.indices.put_mapping(index=index_name, body={"properties": {"transcript_windows": _window_mapping(_compact_profile())}})
+    _forget_index(index_name)
+
+    def window_actions():
+        for hit in scan(es, index=index_name, query={"query": {"match_all": {}}}, _source=["transcript_segments"], size=200):
+            segments = hit.get('_source', {}).get('transcript_segments') or []
+            action = {
+                "_op_type": "update",
+                "_index": hit['_index'],
+                "_id": hit['_id'],
+                "doc": {"transcript_windows": build_transcript_windows(
+                    segments,
+                    app.config['TRANSCRIPT_WINDOW_SECONDS'],
+                    app.config['TRANSCRIPT_WINDOW_OVERLAP']
+                )}
+            }
+            if hit.get('_routing'):
+                action["routing"] = hit['_routing']
+            yield action
+
+    updated, errors = bulk(es, window_actions(), chunk_size=500, raise_on_error=False)
+    if errors:
+        raise RuntimeError(f"{len(errors)} documents failed, first: {errors[0]}")
+    es.indices.refresh(index=index_name)
+    print(f"Backfilled transcript windows for {updated} documents in {index_name}")
+    return updated
+
+def _report_document(source, compact):
+    """A sampled video as it would be written under the standard or compact profile."""
+    document = {key: value for key, value in source.items() if key not in ("playlist_key", "transcript_windows", "transcript_timeline", "suggest")}
+    segments = source_transcript_segments(source)
+    document["transcript_segments"] = segments
+    if 'transcript_full_text' not in document:
+        document["transcript_full_text"] = " ".join(seg.get("text", "") for seg in segments)
+    if compact:
+        document.pop("transcript_full_text")
+        segments = [
+            {"text": seg.get("text", ""), "start": round(float(seg.get("start", 0)), 2),
+             "duration": round(float(seg.get("duration", 0)), 2)}
+            for seg in segments
+        ]
+        document["transcript_segments"] = segments
+    if app.config['TRANSCRIPT_WINDOW_SECONDS'] > 0:
+        document["transcript_windows"] = build_transcript_windows(
+            segments, app.config['TRANSCRIPT_WINDOW_SECONDS'], app.config['TRANSCRIPT_WINDOW_OVERLAP']
+        )
+    return document
+
+def storage_report(index_name, sample_size=500):
+    """
+    Compare the standard and compact mapping profiles on a sample of a
+    playlist: the sample is written to two throwaway indexes, force-merged,
+    and their store sizes and _source bytes are reported.
+    """
+    sources = []
+    for hit in scan(es, index=index_name, query={"query": {"match_all": {}}}, size=200):
+        sources.append(hit.get('_source', {}))
+        if len(sources) >= sample_size:
+            break
+    if not sources:
+        raise ValueError(f"{index_name} has no documents to sample")
+    if uses_segment_index(index_name):
+        segments = get_video_segments(index_name, [source.get('video_id') for source in sources])
+        for source in sources:
+            source['transcript_segments'] = segments.get(source.get('video_id'), [])
+
+    report = {"index": index_name, "documents": len(sources)}
+    for profile, compact in (("standard", False), ("compact", True)):
+        target = f"yts_storage_report_{profile}"
+        documents = [_report_document(source, compact) for source in sources]
+        es.indices.delete(index=target, ignore_unavailable=True)
+        es.indices.create(index=target, body=_video_index_mapping("nested", compact, match_mode="nested"))
+        try:
+            bulk(es, ({"_index": target, "_source": document} for document in documents), chunk_size=200)
+            es.indices.refresh(index=target)
+            es.indices.forcemerge(index=target, max_num_segments=1)
+            stats = es.indices.stats(index=target, metric="store")
+            stats = stats.body if hasattr(stats, 'body') else dict(stats)
+            report[profile] = {
+                "store_bytes": stats['indices'][target]['primaries']['store']['size_in_bytes'],
+                "source_bytes": sum(len(json.dumps(document)) for document in documents)
+            }
+        finally:
+            es.indices.delete(index=target, ignore_unavailable=True)
+
+    for metric in ("store_bytes", "source_bytes"):
+        standard = report["standard"][metric]
+        report[f"{metric}_saved_pct"] = round(100 * (standard - report["compact"][metric]) / standard, 1) if standard else 0.0
+    return report
+
+# Video-level fields compared by incremental change detection
+METADATA_FIELDS = ["title", "description", "channel", "published_at", "view_count", "thumbnail"]
+
+def get_indexed_video_fields(index_name, fields=None):
+    """Map every indexed video_id to the requested _source fields (METADATA_FIELDS by default)."""
+    fields = METADATA_FIELDS if fields is None else fields
     try:
         # Check if index exists
         if not es.indices.exists(index=index_name):
-            return []
+            return {}
             
         # Use the Scan helper to fetch ALL IDs efficiently
         # This handles millions of results without the "Result window too large" error
@@ -88,65 +578,561 @@ def get_indexed_video_ids(index_name):
             es,
             index=index_name,
             query={"query": {"match_all": {}}},
-            _source=["video_id"],
+            _source=["video_id"] + list(fields),
             size=1000  # Fetch in batches of 1000
         )
 
-        video_ids = []
+        indexed = {}
         for hit in scanner:
-            vid = hit.get('_source', {}).get('video_id')
+            source = hit.get('_source', {})
+            vid = source.pop('video_id', None)
             if vid:
-                video_ids.append(vid)
+                indexed[vid] = source
         
-        return video_ids
+        return indexed
         
     except Exception as e:
         print(f"Error getting indexed video IDs: {e}")
+        return {}
+
+def video_metadata(video_data):
+    """The METADATA_FIELDS of a listing entry, in indexed form."""
+    document = build_video_document(video_data, None)
+    return {field: document[field] for field in METADATA_FIELDS}
+
+def changed_metadata(video_data, stored):
+    """METADATA_FIELDS of a listing entry that differ from the stored document."""
+    return {field: value for field, value in video_metadata(video_data).items() if stored.get(field) != value}
+
+def delete_videos(index_name, video_ids):
+    """Bulk-delete videos (and their segment documents) from a playlist index."""
+    if not video_ids:
+        return []
+    actions = [
+        {"_op_type": "delete", "_index": index_name, "_id": document_id(index_name, video_id)}
+        for video_id in video_ids
+    ]
+    errors = bulk_writer.submit(actions).wait(app.config['BULK_WAIT_TIMEOUT'])
+    # A missing document is already gone, which is what we wanted
+    errors = [error for error in errors if "not_found" not in error.get("error", "")]
+
+    if uses_segment_index(index_name):
+        es.delete_by_query(
+            index=segment_index_name(index_name),
+            body={"query": {"terms": {"video_id": list(video_ids)}}},
+            conflicts="proceed",
+            wait_for_completion=True
+        )
+    print(f"Deleted {len(video_ids)} removed videos from {index_name}")
+    return errors
+
+def update_video_metadata(index_name, updates):
+    """Bulk partial updates of changed metadata, {video_id: {field: value}}."""
+    if not updates:
+        return []
+    has_suggest = _index_layout(index_name)["suggest"]
+    actions = []
+    for video_id, changed in updates.items():
+        action = {"_op_type": "update", "_index": index_name, "_id": document_id(index_name, video_id)}
+        if has_suggest and "title" in changed:
+            # The first completion input is the title; keep it in sync
+            action["script"] = {
+                "source": "ctx._source.putAll(params.doc); "
+                          "if (ctx._source.suggest instanceof List && !ctx._source.suggest.isEmpty()) "
+                          "{ ctx._source.suggest[0].input = [params.doc.title]; }",
+                "lang": "painless",
+                "params": {"doc": changed}
+            }
+        else:
+            action["doc"] = changed
+        actions.append(action)
+    errors = bulk_writer.submit(actions).wait(app.config['BULK_WAIT_TIMEOUT'])
+    print(f"Updated metadata of {len(updates)} videos in {index_name}")
+    return errors
+
+class _BulkTicket:
+    """Tracks the actions submitted by one caller until their flush completes."""
+
+    def __init__(self, size):
+        self.remaining = size
+        self.errors = []
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            return [{"error": f"Bulk flush did not complete within {timeout}s"}]
+        return self.errors
+
+
+class BulkVideoWriter:
+    """
+    Process-wide buffer of bulk actions.
+
+    Every process_video_task in a gevent worker shares one writer, so 50
+    greenlets produce a handful of _bulk requests instead of 50 index +
+    refresh round-trips. The buffer is flushed when it holds flush_docs
+    actions, reaches flush_bytes, or its oldest action is older than
+    flush_interval seconds. Nothing here refreshes the index; the playlist
+    task does that once at the end.
+    """
+
+    def __init__(self, flush_docs, flush_bytes, flush_interval):
+        self.flush_docs = flush_docs
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._oldest = None
+        self._timer = None
+
+    def submit(self, actions):
+        """Queue actions and return a ticket to wait on for per-document results."""
+        ticket = _BulkTicket(len(actions))
+        if not actions:
+            ticket.done.set()
+            return ticket
+
+        flush_now = False
+        with self._lock:
+            for action in actions:
+                size = len(json.dumps(action.get("_source", action.get("doc", {})), default=str))
+                self._buffer.append((ticket, action))
+                self._buffer_bytes += size
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._buffer) >= self.flush_docs or self._buffer_bytes >= self.flush_bytes:
+                flush_now = True
+            self._ensure_timer()
+
+        if flush_now:
+            self.flush()
+        return ticket
+
+    def flush(self):
+        """Send everything currently buffered as one streaming bulk request."""
+        with self._lock:
+            pending = self._buffer
+            self._buffer = []
+            self._buffer_bytes = 0
+            self._oldest = None
+
+        if not pending:
+            return
+
+        results = []
+        try:
+            # max_retries=0 keeps results in request order so they can be
+            # matched back to their tickets; failed docs are retried by the task.
+            for ok, info in streaming_bulk(
+                es,
+                (action for _, action in pending),
+                chunk_size=max(len(pending), 1),
+                max_chunk_bytes=max(self.flush_bytes, 1),
+                raise_on_error=False,
+                raise_on_exception=False,
+                max_retries=0
+            ):
+                results.append((ok, info))
+        except Exception as e:
+            print(f"Bulk flush failed: {e}")
+
+        for position, (ticket, action) in enumerate(pending):
+            if position < len(results):
+                ok, info = results[position]
+            else:
+                ok, info = False, {"error": "No bulk response for document"}
+            if not ok:
+                item = next(iter(info.values()), info) if isinstance(info, dict) else info
+                error = item.get("error", item) if isinstance(item, dict) else item
+                ticket.errors.append({"_id": action.get("_id"), "error": str(error)})
+            ticket.remaining -= 1
+            if ticket.remaining <= 0:
+                ticket.done.set()
+
+    def _ensure_timer(self):
+        # Caller holds the lock.
+        if self._timer is None or not self._timer.is_alive():
+            self._timer = threading.Thread(target=self._run_timer, daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.flush_interval / 2)
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if due:
+                self.flush()
+
+
+bulk_writer = BulkVideoWriter(
+    flush_docs=app.config['BULK_FLUSH_DOCS'],
+    flush_bytes=app.config['BULK_FLUSH_BYTES'],
+    flush_interval=app.config['BULK_FLUSH_INTERVAL']
+)
+
+def build_video_document(video_data, transcript):
+    """Build the Elasticsearch document for a video and its transcript."""
+    formatted_transcript = []
+    all_text_parts = []
+
+    if transcript:
+        for segment in transcript:
+            text = segment.get("text", "")
+            formatted_transcript.append({
+                "text": text,
+                # Centisecond precision is plenty for seeking and keeps _source small
+                "start": round(float(segment.get("start", 0)), 2),
+                "duration": round(float(segment.get("duration", 0)), 2)
+            })
+            all_text_parts.append(text)
+
+    return {
+        "video_id": video_data["id"],
+        "title": video_data["title"],
+        "description": video_data.get("description", ""),
+        "channel": video_data["channelTitle"],
+        "published_at": video_data["publishedAt"],
+        "view_count": int(video_data["viewCount"]),
+        "thumbnail": video_data["thumbnail"],
+        "transcript_full_text": " ".join(all_text_parts),
+        "transcript_segments": formatted_transcript
+    }
+
+def build_segment_documents(video_id, segments, window_size=1):
+    """
+    Group consecutive transcript segments into windows of window_size and
+    return one flat document per window for the segment index.
+    """
+    window_size = max(int(window_size or 1), 1)
+    documents = []
+    for position, i in enumerate(range(0, len(segments), window_size)):
+        window = segments[i:i + window_size]
+        start = window[0]["start"]
+        end = window[-1]["start"] + window[-1]["duration"]
+        documents.append({
+            "video_id": video_id,
+            "position": position,
+            "text": " ".join(seg["text"] for seg in window),
+            "start": start,
+            "duration": round(end - start, 3)
+        })
+    return documents
+
+def build_transcript_timeline(segments):
+    """
+    Character offset of every segment inside transcript_full_text (segments
+    joined by single spaces) with its start and duration, as parallel arrays.
+    """
+    offsets, starts, durations = [], [], []
+    offset = 0
+    for seg in segments:
+        offsets.append(offset)
+        starts.append(seg["start"])
+        durations.append(seg["duration"])
+        offset += len(seg["text"]) + 1
+    return {"offsets": offsets, "starts": starts, "durations": durations}
+
+def source_transcript_segments(source):
+    """Caption segments of a stored video document, rebuilt from its offset timeline if needed."""
+    if source.get('transcript_segments') is not None:
+        return source['transcript_segments']
+    timeline = source.get('transcript_timeline')
+    if not timeline:
         return []
+    text = source.get('transcript_full_text', '')
+    offsets = timeline['offsets']
+    ends = offsets[1:] + [len(text) + 1]
+    return [
+        {"text": text[offset:end - 1], "start": start, "duration": duration}
+        for offset, end, start, duration in zip(offsets, ends, timeline['starts'], timeline['durations'])
+    ]
+
+_MARK_RE = re.compile(r"<mark>(.*?)</mark>", re.S)
+
+def _timeline_matches(source, highlighted):
+    """
+    Turn a whole-field highlight of transcript_full_text back into
+    matching_segments: each <mark> span's offset in the plain text is located
+    in the timeline with a binary search, and marks are regrouped per segment.
+    """
+    timeline = source.get('transcript_timeline')
+    if not timeline or not timeline.get('offsets'):
+        return []
+    text = source.get('transcript_full_text', '')
+    offsets = timeline['offsets']
+
+    # Plain-text (start, end) of every mark
+    spans = []
+    removed = 0
+    for match in _MARK_RE.finditer(highlighted):
+        start = match.start() - removed
+        spans.append((start, start + len(match.group(1))))
+        removed += len("<mark>") + len("</mark>")
+
+    by_segment = {}
+    for start, end in spans:
+        position = bisect.bisect_right(offsets, start) - 1
+        if position < 0:
+            continue
+        by_segment.setdefault(position, []).append((start, end))
+
+    matches = []
+    for position, marks in sorted(by_segment.items()):
+        seg_start = offsets[position]
+        seg_end = offsets[position + 1] - 1 if position + 1 < len(offsets) else len(text)
+        parts = []
+        cursor = seg_start
+        for start, end in marks:
+            end = min(end, seg_end)
+            parts.append(text[cursor:start])
+            parts.append(f"<mark>{text[start:end]}</mark>")
+            cursor = end
+        parts.append(text[cursor:seg_end])
+        matches.append({
+            'text': text[seg_start:seg_end],
+            'highlighted_text': "".join(parts),
+            'start': timeline['starts'][position],
+            'duration': timeline['durations'][position]
+        })
+    return matches
+
+_PHRASE_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in is it its of on or so "
+    "that the this to was we were what with you your uh um".split()
+)
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+def frequent_phrases(text, limit=20, min_count=2):
+    """
+    The most repeated 2- and 3-word shingles of a transcript, skipping those
+    that start or end with a stopword. Returns [(phrase, count), ...].
+    """
+    if limit <= 0 or not text:
+        return []
+    words = _WORD_RE.findall(text.lower())
+    counts = Counter()
+    for n in (2, 3):
+        for i in range(len(words) - n + 1):
+            shingle = words[i:i + n]
+            if shingle[0] in _PHRASE_STOPWORDS or shingle[-1] in _PHRASE_STOPWORDS:
+                continue
+            counts[" ".join(shingle)] += 1
+    return [(phrase, count) for phrase, count in counts.most_common(limit) if count >= min_count]
+
+def build_suggest_inputs(index_name, document, segments):
+    """Completion inputs for a video: its title (highest weight) and frequent transcript phrases."""
+    contexts = {"playlist": [playlist_key(index_name)]}
+    inputs = [{"input": [document["title"]], "weight": 100, "contexts": contexts}]
+    transcript_text = " ".join(seg.get("text", "") for seg in segments)
+    for phrase, count in frequent_phrases(transcript_text, app.config['SUGGEST_PHRASES_PER_VIDEO']):
+        inputs.append({"input": [phrase], "weight": min(count, 99), "contexts": contexts})
+    return inputs
+
+def build_video_actions(index_name, video_data, transcript, prewindowed=False):
+    """
+    Bulk actions for one video: the video document plus, in segment storage,
+    its segment documents. prewindowed transcripts (copied from another
+    segment index) are not grouped into windows again.
+    """
+    document = build_video_document(video_data, transcript)
+    doc_id = document_id(index_name, video_data["id"])
+    shared_key = playlist_key(index_name) if is_shared_index(index_name) else None
+    if shared_key:
+        document["playlist_key"] = shared_key
+    actions = []
+    if _index_layout(index_name)["suggest"]:
+        document["suggest"] = build_suggest_inputs(index_name, document, document["transcript_segments"])
+
+    if uses_segment_index(index_name):
+        segments = document.pop("transcript_segments")
+        seg_index = segment_index_name(index_name)
+        window_size = 1 if prewindowed else app.config['SEGMENT_WINDOW_SIZE']
+        for seg_doc in build_segment_documents(document["video_id"], segments, window_size):
+            if shared_key:
+                seg_doc["playlist_key"] = shared_key
+            actions.append({
+                "_op_type": "index",
+                "_index": seg_index,
+                "_id": f"{doc_id}_{seg_doc['position']}",
+                "_source": seg_doc
+            })
+    elif uses_offset_timeline(index_name):
+        document["transcript_timeline"] = build_transcript_timeline(document.pop("transcript_segments"))
+    else:
+        if uses_transcript_windows(index_name):
+            document["transcript_windows"] = build_transcript_windows(
+                document["transcript_segments"],
+                app.config['TRANSCRIPT_WINDOW_SECONDS'],
+                app.config['TRANSCRIPT_WINDOW_OVERLAP']
+            )
+        if _index_layout(index_name)["derived_full_text"]:
+            # copy_to rebuilds it from the segments at index time
+            document.pop("transcript_full_text")
+
+    actions.insert(0, {
+        "_op_type": "index",
+        "_index": index_name,
+        "_id": doc_id,
+        "_source": document
+    })
+    return actions
 
 def index_video(index_name, video_data, transcript):
-    """Index a video and its transcript."""
+    """
+    Queue a video and its transcript on the shared bulk writer and wait for
+    the flush. Returns the list of per-document errors (empty on success).
+    The index is not refreshed here; call refresh_index once the playlist is done.
+    """
     try:
-        # Format transcript segments if available
-        formatted_transcript = []
-        all_text_parts = []
-        
-        if transcript:
-            for segment in transcript:
-                text = segment.get("text", "")
-                formatted_transcript.append({
-                    "text": text,
-                    "start": float(segment.get("start", 0)),
-                    "duration": float(segment.get("duration", 0))
-                })
-                all_text_parts.append(text)
-
-        # Prepare document
-        document = {
-            "video_id": video_data["id"],
-            "title": video_data["title"],
-            "description": video_data.get("description", ""),
-            "channel": video_data["channelTitle"],
-            "published_at": video_data["publishedAt"],
-            "view_count": int(video_data["viewCount"]),
-            "thumbnail": video_data["thumbnail"],
-            "transcript_full_text": " ".join(all_text_parts),
-            "transcript_segments": formatted_transcript
-        }
-
-        # Index document
-        print(f"Indexing video {video_data['id']}")
-        es.index(index=index_name, id=video_data["id"], body=document)
-        es.indices.refresh(index=index_name)
-        print(f"Successfully indexed video {video_data['id']}")
-        return True
+        actions = build_video_actions(index_name, video_data, transcript)
+        print(f"Queueing video {video_data['id']} for bulk indexing ({len(actions)} documents)")
+        errors = bulk_writer.submit(actions).wait(app.config['BULK_WAIT_TIMEOUT'])
+        if errors:
+            print(f"Error indexing video {video_data['id']}: {errors}")
+        else:
+            print(f"Successfully indexed video {video_data['id']}")
+        return errors
 
     except Exception as e:
         print(f"Error indexing video {video_data['id']}: {e}")
-        return False
+        return [{"_id": video_data.get("id"), "error": str(e)}]
+
+def index_videos(index_name, items):
+    """
+    Index a batch of (video_data, transcript) pairs with one bulk request.
+    Returns {video_id: [errors]} for the videos that failed.
+    """
+    actions = []
+    owners = {}
+    for video_data, transcript in items:
+        for action in build_video_actions(index_name, video_data, transcript):
+            owners[action['_id']] = video_data['id']
+            actions.append(action)
+
+    ticket = bulk_writer.submit(actions)
+    bulk_writer.flush()
+    failures = {}
+    for error in ticket.wait(app.config['BULK_WAIT_TIMEOUT']):
+        if error.get('_id') in owners:
+            failures.setdefault(owners[error['_id']], []).append(error)
+        else:
+            # Whole flush failed or timed out
+            for video_data, _ in items:
+                failures.setdefault(video_data['id'], []).append(error)
+    print(f"Bulk indexed {len(items) - len(failures)}/{len(items)} videos into {index_name}")
+    return failures
+
+def find_indexed_copies(index_name, video_ids, chunk_size=1000):
+    """
+    Find videos that are already indexed in another playlist.
+
+    Runs a terms lookup on video_id across every playlist_* index (collapsed
+    so each video comes back once) and returns
+    {video_id: (source_index_name, _source)}, excluding the target playlist.
+    """
+    own_key = playlist_key(index_name)
+    found = {}
+    video_ids = list(video_ids)
+
+    for i in range(0, len(video_ids), chunk_size):
+        chunk = video_ids[i:i + chunk_size]
+        raw_response = es.search(
+            index=f"playlist_*,-{index_name}",
+            body={
+                "size": len(chunk),
+                "query": {"terms": {"video_id": chunk}},
+                "collapse": {"field": "video_id"},
+                # Windows and suggest inputs are rebuilt for the copy; skip them
+                "_source": {"excludes": ["transcript_windows", "suggest"]}
+            },
+            ignore_unavailable=True,
+            allow_no_indices=True
+        )
+        response = raw_response.body if hasattr(raw_response, 'body') else dict(raw_response)
 
-def search_videos(index_name, query, size=10, from_pos=0, search_in=None, channel_filter=None):
-    """Search for videos in the index with advanced boolean and phrase support."""
+        for hit in response.get('hits', {}).get('hits', []):
+            source = hit.get('_source', {})
+            # Shared indexes resolve every alias to the same yts_videos_<n>;
+            # the playlist_key on the document tells the playlists apart.
+            source_key = source.pop('playlist_key', None) or playlist_key(hit['_index'])
+            if source_key == own_key or not source.get('video_id'):
+                continue
+            found[source['video_id']] = (get_playlist_index(source_key), source)
+
+    return found
+
+def copy_indexed_videos(index_name, videos):
+    """
+    Copy videos that another playlist already indexed into this playlist
+    with the bulk writer, instead of fetching their transcripts again.
+    Current listing metadata (title, views, ...) wins over the stored copy.
+    Returns the set of video IDs that were copied.
+    """
+    videos_by_id = {video['id']: video for video in videos}
+    try:
+        copies = find_indexed_copies(index_name, videos_by_id.keys())
+    except Exception as e:
+        print(f"Cross-playlist lookup failed for {index_name}: {e}")
+        return set()
+    if not copies:
+        return set()
+
+    # Segment-storage sources keep their transcript in their segment index
+    by_source = {}
+    for video_id, (source_index, source) in copies.items():
+        if 'transcript_segments' not in source and 'transcript_timeline' not in source and uses_segment_index(source_index):
+            by_source.setdefault(source_index, []).append(video_id)
+    source_segments = {}
+    for source_index, ids in by_source.items():
+        source_segments.update(get_video_segments(source_index, ids))
+
+    actions = []
+    owners = {}
+    for video_id, (source_index, source) in copies.items():
+        prewindowed = video_id in source_segments
+        transcript = source_segments[video_id] if prewindowed else source_transcript_segments(source)
+        for action in build_video_actions(index_name, videos_by_id[video_id], transcript, prewindowed):
+            owners[action['_id']] = video_id
+            actions.append(action)
+
+    failed = set()
+    for error in bulk_writer.submit(actions).wait(app.config['BULK_WAIT_TIMEOUT']):
+        if error.get('_id') not in owners:
+            # The flush itself failed; fall back to fetching everything
+            return set()
+        failed.add(owners[error['_id']])
+
+    copied = set(copies) - failed
+    print(f"Copied {len(copied)} already-indexed videos into {index_name} ({len(failed)} failed)")
+    return copied
+
+def refresh_index(index_name):
+    """Make everything written to the index searchable (once per indexing run)."""
+    try:
+        bulk_writer.flush()
+        es.indices.refresh(index=index_name)
+        if uses_segment_index(index_name):
+            es.indices.refresh(index=segment_index_name(index_name))
+        print(f"Refreshed index: {index_name}")
+    except Exception as e:
+        print(f"Error refreshing index {index_name}: {e}")
+
+# Nested inner hits can page no further than index.max_inner_result_window
+NESTED_MATCH_LIMIT = 100
+
+def search_videos(index_name, query, size=10, from_pos=0, search_in=None, channel_filter=None, with_facets=None, video_ids=None, pit=None):
+    """
+    Search for videos in the index with advanced boolean and phrase support.
+    The channels_in_results aggregation only runs on the first page unless
+    with_facets says otherwise; later pages return no channels. video_ids
+    restricts the search to those videos.
+
+    pit ({"id", "keep_alive", "search_after"}) searches a point in time
+    opened with open_search_pit instead of from_pos paging; the response
+    then carries the (possibly renewed) pit_id and the search_after values
+    of the next page, or None once the results are exhausted.
+    """
     try:
         if not search_in:
             search_in = ['title', 'description', 'transcript']
@@ -181,21 +1167,34 @@ def search_videos(index_name, query, size=10, from_pos=0, search_in=None, channe
             })
             
         # --- 2. Transcript Segments (Nested Level) ---
-        if 'transcript' in search_in:
+        # In segment storage the segments live in their own index and are
+        # fetched for the current page only (see _segment_matches).
+        segment_storage = uses_segment_index(index_name)
+        # Offset-timeline indexes answer transcript hits from a highlight of
+        # transcript_full_text instead (see _timeline_matches)
+        offset_timeline = uses_offset_timeline(index_name)
+        preview_size = app.config['SEARCH_PREVIEW_MATCHES']
+        # Time windows (when mapped) catch phrases that span two captions
+        nested_path = "transcript_windows" if uses_transcript_windows(index_name) else "transcript_segments"
+        windowed = nested_path == "transcript_windows"
+        if 'transcript' in search_in and not segment_storage and not offset_timeline:
             main_should_clauses.append({
                 "nested": {
-                    "path": "transcript_segments",
+                    "path": nested_path,
                     "query": {
                         "query_string": {
                             **query_config,
-                            "fields": ["transcript_segments.text"]
+                            "fields": [f"{nested_path}.text"]
                         }
                     },
                     "inner_hits": {
-                        "size": 100, 
+                        # A preview; the rest is paged by search_video_matches.
+                        # A window only repeats a match of the window after
+                        # it, so twice the preview leaves enough to keep
+                        "size": preview_size * 2 if windowed else preview_size,
                         "highlight": {
                             "fields": {
-                                "transcript_segments.text": {
+                                f"{nested_path}.text": {
                                     "number_of_fragments": 0
                                 }
                             },
@@ -216,14 +1215,20 @@ def search_videos(index_name, query, size=10, from_pos=0, search_in=None, channe
             }
         }
 
-        # --- 3. Apply Filters (Channels) ---
+        # --- 3. Apply Filters (Channels, videos) ---
+        filters = []
         if channel_filter:
+            filters.append({"terms": {"channel": channel_filter}})
+        if video_ids:
+            filters.append({"terms": {"video_id": list(video_ids)}})
+        if pit and is_shared_index(index_name):
+            # A point-in-time search names no index, so the alias filter is not applied
+            filters.append({"term": {"playlist_key": playlist_key(index_name)}})
+        if filters:
             final_query = {
                 "bool": {
                     "must": [main_query],
-                    "filter": {
-                        "terms": {"channel": channel_filter}
-                    }
+                    "filter": filters
                 }
             }
         else:
@@ -232,6 +1237,9 @@ def search_videos(index_name, query, size=10, from_pos=0, search_in=None, channe
         # --- 4. Aggregations & Search Body ---
         search_body = {
             "query": final_query,
+            # Only what the results are built from; transcripts stay on the
+            # server (nested inner hits load their own _source)
+            "_source": ["video_id", "title", "description", "channel", "published_at", "view_count", "thumbnail"],
             "highlight": {
                 "pre_tags": ["<mark>"],
                 "post_tags": ["</mark>"],
@@ -240,17 +1248,39 @@ def search_videos(index_name, query, size=10, from_pos=0, search_in=None, channe
                     "description": {"number_of_fragments": 2, "fragment_size": 150}
                 }
             },
-            "aggs": {
-                "channels_in_results": {
-                    "terms": {"field": "channel", "size": 100}
-                }
-            },
             "size": size,
             "from": from_pos
         }
+        if pit:
+            # Page with search_after over a fixed snapshot; the _shard_doc
+            # tiebreaker keeps the order total so no hit is skipped or repeated
+            del search_body["from"]
+            search_body["pit"] = {"id": pit["id"], "keep_alive": pit["keep_alive"]}
+            search_body["sort"] = [{"_score": "desc"}, {"_shard_doc": "asc"}]
+            if pit.get("search_after"):
+                search_body["search_after"] = pit["search_after"]
+        if with_facets is None:
+            with_facets = from_pos == 0 and not (pit and pit.get("search_after"))
+        if with_facets:
+            search_body["aggs"] = {
+                "channels_in_results": {
+                    "terms": {"field": "channel", "size": 100}
+                }
+            }
+        if offset_timeline and 'transcript' in search_in:
+            # Whole-field highlight served from the indexed offsets; the
+            # text itself is read from the highlight, not from _source
+            search_body["highlight"]["fields"]["transcript_full_text"] = {
+                "number_of_fragments": 0,
+                "type": "unified"
+            }
+            search_body["_source"].append("transcript_timeline")
 
         # Execute search
-        raw_response = es.search(index=index_name, body=search_body)
+        if pit:
+            raw_response = es.search(body=search_body)
+        else:
+            raw_response = es.search(index=index_name, body=search_body)
         
         # Handle ES 8.x object vs dict
         if hasattr(raw_response, 'body'):
@@ -268,22 +1298,48 @@ def search_videos(index_name, query, size=10, from_pos=0, search_in=None, channe
              for bucket in response['aggregations']['channels_in_results']['buckets']:
                 channels.append({'name': bucket['key'], 'count': bucket['doc_count']})
 
+        segment_matches = {}
+        if segment_storage and 'transcript' in search_in and hits:
+            page_ids = [hit['_source'].get('video_id') for hit in hits]
+            segment_matches = _segment_matches(index_name, query_config, page_ids, preview_size)
+
         formatted_results = []
         for hit in hits:
             source = hit['_source']
             highlights = hit.get('highlight', {})
             
             transcript_matches = []
-            if 'inner_hits' in hit and 'transcript_segments' in hit['inner_hits']:
-                for inner_hit in hit['inner_hits']['transcript_segments']['hits']['hits']:
+            match_count = 0
+            if 'inner_hits' in hit and nested_path in hit['inner_hits']:
+                inner_hits = hit['inner_hits'][nested_path]['hits']
+                total_windows = inner_hits['total']['value']
+                repeated = 0
+                for inner_hit in inner_hits['hits']:
                     seg_source = inner_hit['_source']
-                    h_text = inner_hit.get('highlight', {}).get('transcript_segments.text', [seg_source['text']])[0]
+                    h_text = inner_hit.get('highlight', {}).get(f'{nested_path}.text', [seg_source['text']])[0]
+                    if windowed and not window_owns_match(seg_source, h_text):
+                        # Only matched in the overlap the next window owns
+                        repeated += 1
+                        continue
                     transcript_matches.append({
                         'text': seg_source['text'],
                         'highlighted_text': h_text,
                         'start': seg_source['start'],
                         'duration': seg_source['duration']
                     })
+                transcript_matches = transcript_matches[:preview_size]
+                # Exact when every matching window was fetched; otherwise only
+                # the repeats seen in the preview are discounted and the
+                # matches endpoint returns the exact count
+                match_count = min(total_windows - repeated, NESTED_MATCH_LIMIT)
+            elif segment_storage:
+                transcript_matches, match_count = segment_matches.get(source.get('video_id'), ([], 0))
+            elif offset_timeline and highlights.get('transcript_full_text'):
+                highlighted = highlights['transcript_full_text'][0]
+                source['transcript_full_text'] = _MARK_RE.sub(r"\1", highlighted)
+                transcript_matches = _timeline_matches(source, highlighted)
+                match_count = len(transcript_matches)
+                transcript_matches = transcript_matches[:preview_size]
             
             formatted_results.append({
                 'id': source.get('video_id'),
@@ -295,52 +1351,458 @@ def search_videos(index_name, query, size=10, from_pos=0, search_in=None, channe
                 'published_at': source.get('published_at'),
                 'view_count': source.get('view_count', 0),
                 'thumbnail': source.get('thumbnail'),
-                'matching_segments': transcript_matches
+                'matching_segments': transcript_matches,
+                'match_count': match_count
             })
 
-        return {'results': formatted_results, 'total': total_count, 'channels': channels}
+        results = {'results': formatted_results, 'total': total_count, 'channels': channels}
+        if pit:
+            results['pit_id'] = response.get('pit_id', pit["id"])
+            results['search_after'] = hits[-1]['sort'] if len(hits) == size else None
+        return results
         
     except Exception as e:
         print(f"Error in search_videos: {str(e)}")
         traceback.print_exc()
         return {'results': [], 'total': 0, 'channels': [], 'error': str(e)}
 
-def export_playlist_data(index_name, max_size=10000):
-    """Export all data from a playlist index as JSON."""
+def open_search_pit(index_name, keep_alive):
+    """Open a point in time on a playlist index (or alias) and return its id."""
+    response = es.open_point_in_time(index=index_name, keep_alive=keep_alive)
+    if hasattr(response, 'body'):
+        response = response.body
+    return response["id"]
+
+def close_search_pit(pit_id):
+    """Release a point in time early; one that already expired is ignored."""
     try:
-        if not es.indices.exists(index=index_name):
-            return {"error": f"Index {index_name} does not exist"}, False
+        es.options(ignore_status=404).close_point_in_time(id=pit_id)
+    except Exception as e:
+        print(f"Could not close point in time: {str(e)}")
 
-        query = {"query": {"match_all": {}}, "size": max_size}
-        response = es.search(index=index_name, body=query)
-        
-        # Handle ES 8.x object vs dict
-        if hasattr(response, 'body'):
-            hits = response.body['hits']['hits']
-        else:
-            hits = response['hits']['hits']
-            
-        playlist_data = [hit.get('_source', {}) for hit in hits]
-        
-        metadata = {}
-        if es.indices.exists(index="yts_metadata"):
-             try:
-                playlist_id_guess = index_name.replace("playlist_", "").upper()
-                meta_doc = es.get(index="yts_metadata", id=playlist_id_guess, ignore=[404])
-                if meta_doc.get('found'):
-                    metadata = meta_doc['_source']
-             except Exception as e:
-                print(f"Error retrieving metadata: {e}")
-        
-        return {
-            "metadata": metadata,
-            "videos": playlist_data,
-            "exported_at": datetime.now().isoformat(),
-            "total_videos": len(playlist_data)
-        }, True
+def _hit_playlist_index(hit):
+    """Playlist index (or alias) name of a hit; shared indexes carry the playlist_key."""
+    key = hit.get('_source', {}).get('playlist_key')
+    return get_playlist_index(key) if key else hit['_index']
+
+def search_all_playlists(index_names, query, size=10, from_pos=0, search_in=None, channel_filter=None):
+    """
+    Search several playlists in one ranked request.
+
+    Videos are ranked globally over every index (dfs_query_then_fetch, so
+    term statistics are shared) with a flat title/description/full-text
+    query, and collapsed on video_id so a video in several playlists shows
+    up once, listing the playlists it was found in. Transcript matches are
+    then filled in for the page only, per playlist, by search_videos.
+    """
+    try:
+        if not search_in:
+            search_in = ['title', 'description', 'transcript']
+        fields = []
+        if 'title' in search_in:
+            fields.append("title^3")
+        if 'description' in search_in:
+            fields.append("description^2")
+        if 'transcript' in search_in:
+            fields.append("transcript_full_text")
+        if not fields:
+            return {'results': [], 'total': 0, 'channels': [], 'error': 'No fields selected for search'}
+
+        query_config = {
+            "query": query,
+            "default_operator": "AND",
+            "analyze_wildcard": True,
+            "phrase_slop": 1,
+            "lenient": True
+        }
+        final_query = {"query_string": {**query_config, "fields": fields}}
+        if channel_filter:
+            final_query = {"bool": {"must": [final_query], "filter": {"terms": {"channel": channel_filter}}}}
+
+        search_body = {
+            "query": final_query,
+            "_source": ["video_id", "title", "description", "channel", "published_at", "view_count", "thumbnail", "playlist_key"],
+            "collapse": {
+                "field": "video_id",
+                "inner_hits": {"name": "playlists", "size": 20, "_source": ["playlist_key"]}
+            },
+            "highlight": {
+                "pre_tags": ["<mark>"],
+                "post_tags": ["</mark>"],
+                "fields": {
+                    "title": {"number_of_fragments": 0},
+                    "description": {"number_of_fragments": 2, "fragment_size": 150}
+                }
+            },
+            # Collapsed hits.total still counts documents; count distinct videos instead
+            "aggs": {"unique_videos": {"cardinality": {"field": "video_id"}}},
+            "size": size,
+            "from": from_pos
+        }
+        if from_pos == 0:
+            search_body["aggs"]["channels_in_results"] = {"terms": {"field": "channel", "size": 100}}
+
+        raw_response = es.search(
+            index=",".join(index_names),
+            body=search_body,
+            search_type="dfs_query_then_fetch",
+            ignore_unavailable=True,
+            allow_no_indices=True
+        )
+        response = raw_response.body if hasattr(raw_response, 'body') else dict(raw_response)
+
+        hits = response.get('hits', {}).get('hits', [])
+        aggregations = response.get('aggregations', {})
+        total_count = aggregations.get('unique_videos', {}).get('value', 0)
+        channels = [
+            {'name': bucket['key'], 'count': bucket['doc_count']}
+            for bucket in aggregations.get('channels_in_results', {}).get('buckets', [])
+        ]
+
+        # Transcript matches for the page, one search per playlist, in parallel
+        segment_matches = {}
+        if 'transcript' in search_in and hits:
+            by_index = {}
+            for hit in hits:
+                by_index.setdefault(_hit_playlist_index(hit), []).append(hit['_source'].get('video_id'))
+
+            def page_matches(item):
+                page_index, ids = item
+                result = search_videos(page_index, query, len(ids), 0, ['transcript'], with_facets=False, video_ids=ids)
+                return {video['id']: (video['matching_segments'], video['match_count']) for video in result.get('results', [])}
+
+            with ThreadPoolExecutor(max_workers=min(len(by_index), 8)) as executor:
+                for matches in executor.map(page_matches, by_index.items()):
+                    segment_matches.update(matches)
+
+        formatted_results = []
+        for hit in hits:
+            source = hit['_source']
+            highlights = hit.get('highlight', {})
+            transcript_matches, match_count = segment_matches.get(source.get('video_id'), ([], 0))
+            playlist_indexes = [
+                _hit_playlist_index(inner_hit)
+                for inner_hit in hit.get('inner_hits', {}).get('playlists', {}).get('hits', {}).get('hits', [])
+            ]
+            formatted_results.append({
+                'id': source.get('video_id'),
+                'title': source.get('title'),
+                'highlighted_title': highlights.get('title', [source.get('title')])[0],
+                'description': source.get('description'),
+                'highlighted_description': highlights.get('description', []),
+                'channel_title': source.get('channel'),
+                'published_at': source.get('published_at'),
+                'view_count': source.get('view_count', 0),
+                'thumbnail': source.get('thumbnail'),
+                'playlists': list(dict.fromkeys(playlist_indexes or [_hit_playlist_index(hit)])),
+                'matching_segments': transcript_matches,
+                'match_count': match_count
+            })
+
+        return {'results': formatted_results, 'total': total_count, 'channels': channels}
+
+    except Exception as e:
+        print(f"Error in search_all_playlists: {str(e)}")
+        traceback.print_exc()
+        return {'results': [], 'total': 0, 'channels': [], 'error': str(e)}
+
+def suggest_completions(index_name, prefix, size=8):
+    """
+    Completions for a search-box prefix: titles and frequent transcript
+    phrases from the completion suggester, or a title prefix query on
+    indexes created before the suggest field existed.
+    """
+    if _index_layout(index_name)["suggest"]:
+        body = {
+            "_source": False,
+            "suggest": {
+                "completions": {
+                    "prefix": prefix,
+                    "completion": {
+                        "field": "suggest",
+                        "size": size,
+                        "skip_duplicates": True,
+                        "contexts": {"playlist": [playlist_key(index_name)]}
+                    }
+                }
+            }
+        }
+        raw_response = es.search(index=index_name, body=body)
+        response = raw_response.body if hasattr(raw_response, 'body') else dict(raw_response)
+        options = response.get('suggest', {}).get('completions', [{}])[0].get('options', [])
+        return [option['text'] for option in options]
+
+    body = {
+        "size": size,
+        "_source": ["title"],
+        "query": {"match_phrase_prefix": {"title": {"query": prefix}}}
+    }
+    raw_response = es.search(index=index_name, body=body)
+    response = raw_response.body if hasattr(raw_response, 'body') else dict(raw_response)
+    titles = [hit['_source'].get('title') for hit in response.get('hits', {}).get('hits', [])]
+    return list(dict.fromkeys(title for title in titles if title))
+
+def _segment_matches(index_name, query_config, video_ids, per_video=100):
+    """
+    Matching segments for a page of videos from the flat segment index,
+    grouped with a collapse on video_id. Returns
+    {video_id: ([segment, ...], total matching segments)}.
+    """
+    body = {
+        "size": len(video_ids),
+        "_source": False,
+        "query": {
+            "bool": {
+                "must": [{"query_string": {**query_config, "fields": ["text"]}}],
+                "filter": [{"terms": {"video_id": video_ids}}]
+            }
+        },
+        "collapse": {
+            "field": "video_id",
+            "inner_hits": {
+                "name": "segments",
+                "size": per_video,
+                "_source": ["text", "start", "duration"],
+                "highlight": {
+                    "fields": {"text": {"number_of_fragments": 0}},
+                    "pre_tags": ["<mark>"],
+                    "post_tags": ["</mark>"]
+                }
+            }
+        }
+    }
+
+    raw_response = es.search(index=segment_index_name(index_name), body=body)
+    response = raw_response.body if hasattr(raw_response, 'body') else dict(raw_response)
+
+    matches = {}
+    for hit in response.get('hits', {}).get('hits', []):
+        video_id = hit.get('fields', {}).get('video_id', [None])[0]
+        inner_hits = hit.get('inner_hits', {}).get('segments', {}).get('hits', {})
+        segments = []
+        for inner_hit in inner_hits.get('hits', []):
+            seg_source = inner_hit['_source']
+            h_text = inner_hit.get('highlight', {}).get('text', [seg_source['text']])[0]
+            segments.append({
+                'text': seg_source['text'],
+                'highlighted_text': h_text,
+                'start': seg_source['start'],
+                'duration': seg_source['duration']
+            })
+        matches[video_id] = (segments, inner_hits.get('total', {}).get('value', len(segments)))
+    return matches
+
+def search_video_matches(index_name, video_id, query, from_pos=0, size=20):
+    """
+    One page of a video's transcript matches, in the order search results
+    preview them (best first; transcript order for offset timelines), with
+    the total number of matching segments. Nested indexes page inner hits,
+    so they page and count no further than NESTED_MATCH_LIMIT matches;
+    overlapping time windows count as one match.
+    """
+    try:
+        query_config = {
+            "query": query,
+            "default_operator": "AND",
+            "analyze_wildcard": True,
+            "phrase_slop": 1,
+            "lenient": True
+        }
+        highlight = {"pre_tags": ["<mark>"], "post_tags": ["</mark>"]}
+
+        if uses_segment_index(index_name):
+            body = {
+                "from": from_pos,
+                "size": size,
+                "_source": ["text", "start", "duration"],
+                "query": {
+                    "bool": {
+                        "must": [{"query_string": {**query_config, "fields": ["text"]}}],
+                        "filter": [{"term": {"video_id": video_id}}]
+                    }
+                },
+                "highlight": {**highlight, "fields": {"text": {"number_of_fragments": 0}}}
+            }
+            raw_response = es.search(index=segment_index_name(index_name), body=body)
+            response = raw_response.body if hasattr(raw_response, 'body') else dict(raw_response)
+            hits = response.get('hits', {})
+            matches = [{
+                'text': hit['_source']['text'],
+                'highlighted_text': hit.get('highlight', {}).get('text', [hit['_source']['text']])[0],
+                'start': hit['_source']['start'],
+                'duration': hit['_source']['duration']
+            } for hit in hits.get('hits', [])]
+            return {'matches': matches, 'total': hits.get('total', {}).get('value', 0)}
+
+        if uses_offset_timeline(index_name):
+            body = {
+                "size": 1,
+                "_source": ["transcript_timeline"],
+                "query": {
+                    "bool": {
+                        "must": [{"query_string": {**query_config, "fields": ["transcript_full_text"]}}],
+                        "filter": [{"term": {"video_id": video_id}}]
+                    }
+                },
+                "highlight": {**highlight, "fields": {"transcript_full_text": {"number_of_fragments": 0, "type": "unified"}}}
+            }
+            raw_response = es.search(index=index_name, body=body)
+            response = raw_response.body if hasattr(raw_response, 'body') else dict(raw_response)
+            hits = response.get('hits', {}).get('hits', [])
+            highlighted = hits[0].get('highlight', {}).get('transcript_full_text', [None])[0] if hits else None
+            if not highlighted:
+                return {'matches': [], 'total': 0}
+            source = hits[0]['_source']
+            source['transcript_full_text'] = _MARK_RE.sub(r"\1", highlighted)
+            matches = _timeline_matches(source, highlighted)
+            return {'matches': matches[from_pos:from_pos + size], 'total': len(matches)}
+
+        nested_path = "transcript_windows" if uses_transcript_windows(index_name) else "transcript_segments"
+        windowed = nested_path == "transcript_windows"
+        from_pos = min(from_pos, NESTED_MATCH_LIMIT)
+        size = max(min(size, NESTED_MATCH_LIMIT - from_pos), 0)
+        # Overlapping windows are deduplicated before paging, so take them all
+        inner_from, inner_size = (0, NESTED_MATCH_LIMIT) if windowed else (from_pos, size)
+        body = {
+            "size": 1,
+            "_source": False,
+            "query": {
+                "bool": {
+                    "must": [{
+                        "nested": {
+                            "path": nested_path,
+                            "query": {"query_string": {**query_config, "fields": [f"{nested_path}.text"]}},
+                            "inner_hits": {
+                                "from": inner_from,
+                                "size": inner_size,
+                                "highlight": {**highlight, "fields": {f"{nested_path}.text": {"number_of_fragments": 0}}}
+                            }
+                        }
+                    }],
+                    "filter": [{"term": {"video_id": video_id}}]
+                }
+            }
+        }
+        raw_response = es.search(index=index_name, body=body)
+        response = raw_response.body if hasattr(raw_response, 'body') else dict(raw_response)
+        hits = response.get('hits', {}).get('hits', [])
+        if not hits:
+            return {'matches': [], 'total': 0}
+        inner_hits = hits[0]['inner_hits'][nested_path]['hits']
+        matches = []
+        for inner_hit in inner_hits['hits']:
+            seg_source = inner_hit['_source']
+            h_text = inner_hit.get('highlight', {}).get(f'{nested_path}.text', [seg_source['text']])[0]
+            if windowed and not window_owns_match(seg_source, h_text):
+                continue
+            matches.append({
+                'text': seg_source['text'],
+                'highlighted_text': h_text,
+                'start': seg_source['start'],
+                'duration': seg_source['duration']
+            })
+        if windowed:
+            return {'matches': matches[from_pos:from_pos + size], 'total': len(matches)}
+        return {'matches': matches, 'total': min(inner_hits['total']['value'], NESTED_MATCH_LIMIT)}
+
+    except Exception as e:
+        print(f"Error in search_video_matches: {str(e)}")
+        traceback.print_exc()
+        return {'matches': [], 'total': 0, 'error': str(e)}
+
+def get_video_segments(index_name, video_ids):
+    """All stored segments for the given videos from the segment index, in transcript order."""
+    segments = {video_id: [] for video_id in video_ids}
+    scanner = scan(
+        es,
+        index=segment_index_name(index_name),
+        query={"query": {"terms": {"video_id": list(video_ids)}}},
+        _source=["video_id", "position", "text", "start", "duration"],
+        size=1000
+    )
+    for hit in scanner:
+        seg = hit['_source']
+        segments.setdefault(seg['video_id'], []).append(seg)
+
+    for video_id, items in segments.items():
+        items.sort(key=lambda seg: seg.get('position', 0))
+        segments[video_id] = [
+            {"text": seg["text"], "start": seg["start"], "duration": seg["duration"]}
+            for seg in items
+        ]
+    return segments
+
+def get_playlist_metadata(playlist_id):
+    """Metadata document for a playlist from yts_metadata, or {} if missing."""
+    try:
+        meta_doc = es.options(ignore_status=404).get(index="yts_metadata", id=playlist_id)
+        if meta_doc.get('found'):
+            return meta_doc['_source']
     except Exception as e:
-        print(f"Error exporting playlist data: {e}")
-        return {"error": str(e)}, False
+        print(f"Error retrieving metadata: {e}")
+    return {}
+
+def iter_playlist_export(index_name, playlist_id, fmt="json", batch_size=200):
+    """
+    Stream every document of a playlist index as JSON text chunks.
+
+    Documents are pulled with the scan helper and written out as they
+    arrive, so memory stays constant regardless of playlist size. 'json'
+    yields one object ({"metadata", "exported_at", "videos": [...],
+    "total_videos"}); 'ndjson' yields a metadata line followed by one line
+    per video.
+    """
+    metadata = get_playlist_metadata(playlist_id)
+    exported_at = datetime.now().isoformat()
+    segment_storage = uses_segment_index(index_name)
+
+    if fmt == "ndjson":
+        yield json.dumps({"type": "metadata", "metadata": metadata, "exported_at": exported_at}) + "\n"
+    else:
+        yield '{"metadata": ' + json.dumps(metadata) + ', "exported_at": ' + json.dumps(exported_at) + ', "videos": ['
+
+    def flush_batch(batch):
+        for video in batch:
+            # Derived from transcript_segments; rebuilt on import
+            video.pop('transcript_windows', None)
+            video.pop('suggest', None)
+            if 'transcript_timeline' in video:
+                video['transcript_segments'] = source_transcript_segments(video)
+                video.pop('transcript_timeline')
+        if segment_storage:
+            segments = get_video_segments(index_name, [video.get('video_id') for video in batch])
+            for video in batch:
+                video['transcript_segments'] = segments.get(video.get('video_id'), [])
+        for video in batch:
+            if 'transcript_full_text' not in video:
+                # Compact indexes do not keep it in _source
+                video['transcript_full_text'] = " ".join(seg.get('text', '') for seg in video.get('transcript_segments') or [])
+        return batch
+
+    total = 0
+    batch = []
+    scanner = scan(es, index=index_name, query={"query": {"match_all": {}}}, size=batch_size)
+    for hit in scanner:
+        batch.append(hit.get('_source', {}))
+        if len(batch) < batch_size:
+            continue
+        for video in flush_batch(batch):
+            yield _export_line(video, fmt, total)
+            total += 1
+        batch = []
+    for video in flush_batch(batch):
+        yield _export_line(video, fmt, total)
+        total += 1
+
+    if fmt == "ndjson":
+        yield json.dumps({"type": "summary", "total_videos": total}) + "\n"
+    else:
+        yield '], "total_videos": ' + str(total) + '}'
+
+def _export_line(video, fmt, position):
+    if fmt == "ndjson":
+        return json.dumps(video) + "\n"
+    return ("" if position == 0 else ",") + json.dumps(video)
 
 def get_channels_for_playlist(index_name):
     """Get all unique channels in a playlist."""
@@ -0,0 +1,183 @@
+import os
+import queue
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from youtube_transcript_api import YouTubeTranscriptApi
+from youtube_transcript_api.proxies import WebshareProxyConfig
+
+from app import app, logger, redis_conn
+
+FETCHER_STATS_KEY_PREFIX = "yts_fetcher_stats:"
+
+
+class TranscriptFetcherPool:
+    """
+    Per-worker pool of YouTubeTranscriptApi clients, each bound to its own
+    keep-alive requests.Session.
+
+    Greenlets check a client out for one fetch and return it afterwards, so
+    TLS handshakes and proxy CONNECTs are reused across videos instead of
+    being paid on every call. At most `size` clients exist per process.
+    Rotating proxies keep Connection: close so every request gets a new exit
+    IP; keep-alive only applies when no rotating proxy is configured.
+    """
+
+    def __init__(self, size, connections_per_session, keep_alive):
+        self.size = max(size, 1)
+        self.connections_per_session = max(connections_per_session, 1)
+        self.keep_alive = keep_alive
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._sessions = []
+        self._fetches = 0
+        self._errors = 0
+        self._fetch_seconds = 0.0
+
+    def _proxy_config(self):
+        username = app.config.get('WEBSHARE_PROXY_USERNAME')
+        password = app.config.get('WEBSHARE_PROXY_PASSWORD')
+        if username and password:
+            return WebshareProxyConfig(proxy_username=username, proxy_password=password)
+        return None
+
+    def _new_client(self):
+        session = Session()
+        proxy_config = self._proxy_config()
+        api = YouTubeTranscriptApi(proxy_config=proxy_config, http_client=session)
+
+        # The library mounts a default-sized adapter; replace it with a sized one.
+        retries = session.get_adapter("https://").max_retries
+        adapter = HTTPAdapter(
+            pool_connections=self.connections_per_session,
+            pool_maxsize=self.connections_per_session,
+            max_retries=retries
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # Rotating proxies (Webshare) need Connection: close so retries after a
+        # block go out through a new IP; only drop it when nothing rotates.
+        rotating = proxy_config is not None and proxy_config.prevent_keeping_connections_alive
+        if self.keep_alive and not rotating:
+            session.headers.pop("Connection", None)
+
+        with self._lock:
+            self._sessions.append(session)
+        return api, session
+
+    @contextmanager
+    def client(self):
+        """Check out a client, creating one while the pool is below its size."""
+        try:
+            entry = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = len(self._sessions) < self.size
+            entry = self._new_client() if can_create else self._idle.get()
+
+        try:
+            yield entry
+        except Exception:
+            # Drop pooled connections so the retry gets a fresh proxy exit IP
+            entry[1].close()
+            raise
+        finally:
+            self._idle.put(entry)
+
+    def fetch(self, video_id, languages=("en",)):
+        """Fetch a transcript as raw segment dicts using a pooled client."""
+        started = time.monotonic()
+        try:
+            with self.client() as (api, _session):
+                return api.fetch(video_id, languages=languages).to_raw_data()
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._fetches += 1
+                self._fetch_seconds += time.monotonic() - started
+                fetches = self._fetches
+            if fetches % app.config['TRANSCRIPT_STATS_EVERY'] == 0:
+                self.publish_stats()
+
+    def stats(self):
+        """Connection-reuse statistics summed over all urllib3 pools of all sessions."""
+        connections = 0
+        requests_sent = 0
+        with self._lock:
+            sessions = list(self._sessions)
+            fetches, errors, seconds = self._fetches, self._errors, self._fetch_seconds
+
+        for session in sessions:
+            for adapter in set(session.adapters.values()):
+                managers = [adapter.poolmanager] + list(getattr(adapter, "proxy_manager", {}).values())
+                for manager in managers:
+                    if manager is None:
+                        continue
+                    for key in list(manager.pools.keys()):
+                        pool = manager.pools.get(key)
+                        if pool is None:
+                            continue
+                        connections += getattr(pool, "num_connections", 0)
+                        requests_sent += getattr(pool, "num_requests", 0)
+
+        return {
+            "pool_size": self.size,
+            "sessions": len(sessions),
+            "idle_sessions": self._idle.qsize(),
+            "fetches": fetches,
+            "errors": errors,
+            "avg_fetch_seconds": round(seconds / fetches, 3) if fetches else 0.0,
+            "http_requests": requests_sent,
+            "new_connections": connections,
+            "connection_reuse_ratio": round(1 - connections / requests_sent, 4) if requests_sent else 0.0
+        }
+
+    def publish_stats(self):
+        """Store this worker's stats in Redis so the API can report on all workers."""
+        if redis_conn is None:
+            return
+        try:
+            key = f"{FETCHER_STATS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+            stats = {k: str(v) for k, v in self.stats().items()}
+            stats["updated_at"] = str(time.time())
+            pipe = redis_conn.pipeline()
+            pipe.hset(key, mapping=stats)
+            pipe.expire(key, 3600)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not publish fetcher stats: {e}")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_fetcher_pool():
+    """Lazily create the process-wide fetcher pool (after the worker has forked)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = TranscriptFetcherPool(
+                    size=app.config['TRANSCRIPT_POOL_SIZE'],
+                    connections_per_session=app.config['TRANSCRIPT_CONNECTIONS_PER_SESSION'],
+                    keep_alive=app.config['TRANSCRIPT_KEEP_ALIVE']
+                )
+    return _pool
+
+
+def get_all_fetcher_stats():
+    """Latest published stats of every worker process."""
+    if redis_conn is None:
+        return {}
+    workers = {}
+    for key in redis_conn.scan_iter(f"{FETCHER_STATS_KEY_PREFIX}*"):
+        workers[key[len(FETCHER_STATS_KEY_PREFIX):]] = redis_conn.hgetall(key)
+    return workers
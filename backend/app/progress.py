@@ -0,0 +1,142 @@
+import json
+import time
+
+from app import logger, redis_conn
+
+PROGRESS_CHANNEL_PREFIX = "yts_progress:"
+PROGRESS_STATE_PREFIX = "yts_progress_state:"
+PROGRESS_COUNTS_PREFIX = "yts_progress_counts:"
+PROGRESS_TTL = 7200
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def _publish(playlist_id, event):
+    redis_conn.publish(f"{PROGRESS_CHANNEL_PREFIX}{playlist_id}", json.dumps(event))
+
+
+def reset_progress(playlist_id, total, skipped=0):
+    """Start a fresh set of atomic counters for an indexing run."""
+    if redis_conn is None:
+        return
+    try:
+        key = f"{PROGRESS_COUNTS_PREFIX}{playlist_id}"
+        pipe = redis_conn.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={"total": total, "skipped": skipped, "done": 0, "failed": 0})
+        pipe.expire(key, PROGRESS_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not reset progress for {playlist_id}: {e}")
+
+
+def extend_progress(playlist_id, total=None, skipped=0):
+    """Grow a run's counters while its listing is still streaming in."""
+    if redis_conn is None:
+        return
+    try:
+        key = f"{PROGRESS_COUNTS_PREFIX}{playlist_id}"
+        pipe = redis_conn.pipeline()
+        if total is not None:
+            pipe.hset(key, "total", total)
+        if skipped:
+            pipe.hincrby(key, "skipped", skipped)
+        pipe.expire(key, PROGRESS_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not extend progress for {playlist_id}: {e}")
+
+
+def get_progress_counts(playlist_id):
+    """Current counters of a run: total, skipped, done, failed."""
+    if redis_conn is None:
+        return {}
+    try:
+        counts = redis_conn.hgetall(f"{PROGRESS_COUNTS_PREFIX}{playlist_id}") or {}
+        return {k: int(v) for k, v in counts.items()}
+    except Exception as e:
+        logger.warning(f"Could not read progress for {playlist_id}: {e}")
+        return {}
+
+
+def record_video_result(playlist_id, video_id, success):
+    """Count one finished video atomically and fan the new progress out to subscribers."""
+    record_video_results(playlist_id, [(video_id, success)])
+
+
+def record_video_results(playlist_id, results):
+    """Count a batch of finished videos, [(video_id, success), ...], with one event."""
+    if redis_conn is None or not playlist_id or not results:
+        return
+    done = sum(1 for _, success in results if success)
+    failed = len(results) - done
+    video_id, success = results[-1]
+    try:
+        key = f"{PROGRESS_COUNTS_PREFIX}{playlist_id}"
+        pipe = redis_conn.pipeline()
+        pipe.hincrby(key, "done", done)
+        pipe.hincrby(key, "failed", failed)
+        pipe.hgetall(key)
+        counts = {k: int(v) for k, v in pipe.execute()[-1].items()}
+
+        total = counts.get("total", 0)
+        progress = counts.get("skipped", 0) + counts.get("done", 0) + counts.get("failed", 0)
+        pct = int((progress / total) * 100) if total else 0
+        _publish(playlist_id, {
+            "type": "progress",
+            "status": "in_progress",
+            "video_id": video_id,
+            "success": success,
+            "batch_size": len(results),
+            "progress": progress,
+            "total": total,
+            "new_videos_count": counts.get("done", 0),
+            "failed_count": counts.get("failed", 0),
+            "message": f"Indexing: {pct}% ({progress}/{total})"
+        })
+    except Exception as e:
+        logger.warning(f"Could not publish progress for {playlist_id}: {e}")
+
+
+def publish_status(playlist_id, status_meta):
+    """Store the orchestrator's full status as the snapshot and broadcast it."""
+    if redis_conn is None:
+        return
+    try:
+        event = {"type": "status", **status_meta}
+        redis_conn.set(f"{PROGRESS_STATE_PREFIX}{playlist_id}", json.dumps(event), ex=PROGRESS_TTL)
+        _publish(playlist_id, event)
+    except Exception as e:
+        logger.warning(f"Could not publish status for {playlist_id}: {e}")
+
+
+def stream_progress(playlist_id, heartbeat=15):
+    """
+    Server-Sent Events for one playlist: the last known status first, then
+    every published event until the run reaches a terminal status.
+    """
+    pubsub = redis_conn.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(f"{PROGRESS_CHANNEL_PREFIX}{playlist_id}")
+    try:
+        snapshot = redis_conn.get(f"{PROGRESS_STATE_PREFIX}{playlist_id}")
+        if snapshot:
+            yield f"data: {snapshot}\n\n"
+            if json.loads(snapshot).get("status") in TERMINAL_STATUSES:
+                return
+
+        last_sent = time.monotonic()
+        while True:
+            message = pubsub.get_message(timeout=1.0)
+            if message is None:
+                if time.monotonic() - last_sent >= heartbeat:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    last_sent = time.monotonic()
+                continue
+
+            data = message["data"]
+            yield f"data: {data}\n\n"
+            last_sent = time.monotonic()
+            if json.loads(data).get("status") in TERMINAL_STATUSES:
+                return
+    finally:
+        pubsub.close()
@@ -0,0 +1,154 @@
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from requests.exceptions import ConnectionError as RequestsConnectionError, ProxyError, Timeout
+from youtube_transcript_api import RequestBlocked, YouTubeRequestFailed
+
+from app import app, logger, redis_conn
+
+LIMIT_KEY = "yts_fetch_limit"
+LEASES_KEY = "yts_fetch_leases"
+DECREASE_LOCK_KEY = "yts_fetch_last_decrease"
+STATS_KEY = "yts_fetch_limiter_stats"
+
+# Take a slot if fewer than floor(limit) unexpired leases exist.
+# KEYS: leases, limit  ARGV: now, lease_expiry, token, initial_limit
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local limit = tonumber(redis.call('GET', KEYS[2]) or ARGV[4])
+if redis.call('ZCARD', KEYS[1]) < math.floor(limit) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# AIMD update of the shared limit.
+# KEYS: limit, decrease_lock  ARGV: congested, increase, factor, min, max, cooldown, initial_limit
+_ADJUST_SCRIPT = """
+local limit = tonumber(redis.call('GET', KEYS[1]) or ARGV[7])
+if ARGV[1] == '1' then
+    if redis.call('SET', KEYS[2], '1', 'NX', 'EX', ARGV[6]) then
+        limit = math.max(tonumber(ARGV[4]), limit * tonumber(ARGV[3]))
+    end
+else
+    limit = math.min(tonumber(ARGV[5]), limit + tonumber(ARGV[2]) / limit)
+end
+redis.call('SET', KEYS[1], tostring(limit))
+return tostring(limit)
+"""
+
+_acquire = None
+_adjust = None
+
+
+def _scripts():
+    global _acquire, _adjust
+    if _acquire is None:
+        _acquire = redis_conn.register_script(_ACQUIRE_SCRIPT)
+        _adjust = redis_conn.register_script(_ADJUST_SCRIPT)
+    return _acquire, _adjust
+
+
+def is_throttle_error(error):
+    """Errors that mean YouTube or the proxy is pushing back, not that the video lacks captions."""
+    if isinstance(error, (RequestBlocked, ProxyError, Timeout, RequestsConnectionError)):
+        return True
+    if isinstance(error, YouTubeRequestFailed) and "429" in str(error):
+        return True
+    return False
+
+
+def _record(latency, congested):
+    _, adjust = _scripts()
+    limit = adjust(
+        keys=[LIMIT_KEY, DECREASE_LOCK_KEY],
+        args=[
+            '1' if congested else '0',
+            app.config['FETCH_LIMIT_INCREASE'],
+            app.config['FETCH_LIMIT_DECREASE_FACTOR'],
+            app.config['FETCH_LIMIT_MIN'],
+            app.config['FETCH_LIMIT_MAX'],
+            app.config['FETCH_LIMIT_COOLDOWN'],
+            app.config['FETCH_LIMIT_INITIAL']
+        ]
+    )
+    pipe = redis_conn.pipeline()
+    pipe.hincrby(STATS_KEY, "throttled" if congested else "ok", 1)
+    pipe.hincrbyfloat(STATS_KEY, "latency_total", latency)
+    pipe.hset(STATS_KEY, "limit", limit)
+    pipe.execute()
+
+
+@contextmanager
+def fetch_slot():
+    """
+    Hold one of the cluster-wide transcript fetch slots.
+
+    The number of slots is an AIMD limit shared by every worker through
+    Redis: each clean fetch adds FETCH_LIMIT_INCREASE/limit, while a
+    throttling error or a fetch slower than FETCH_LATENCY_TARGET multiplies
+    it by FETCH_LIMIT_DECREASE_FACTOR (at most once per cooldown). Slots
+    are leases, so a crashed worker cannot leak them.
+    """
+    if redis_conn is None or not app.config['FETCH_LIMITER_ENABLED']:
+        yield
+        return
+
+    acquire, _ = _scripts()
+    token = uuid.uuid4().hex
+    lease = app.config['FETCH_LEASE_SECONDS']
+    deadline = time.monotonic() + app.config['FETCH_ACQUIRE_TIMEOUT']
+    wait = 0.05
+    acquired = False
+    try:
+        while True:
+            now = time.time()
+            if acquire(keys=[LEASES_KEY, LIMIT_KEY], args=[now, now + lease, token, app.config['FETCH_LIMIT_INITIAL']]):
+                acquired = True
+                break
+            if time.monotonic() >= deadline:
+                # Don't stall the task forever; the limiter is advisory
+                logger.warning("Timed out waiting for a fetch slot; fetching anyway")
+                break
+            time.sleep(random.uniform(0, wait))
+            wait = min(wait * 2, 2.0)
+    except Exception as e:
+        logger.warning(f"Fetch limiter unavailable: {e}")
+
+    started = time.monotonic()
+    congested = False
+    try:
+        yield
+    except Exception as e:
+        congested = is_throttle_error(e)
+        raise
+    finally:
+        latency = time.monotonic() - started
+        congested = congested or latency > app.config['FETCH_LATENCY_TARGET']
+        try:
+            if acquired:
+                redis_conn.zrem(LEASES_KEY, token)
+            _record(latency, congested)
+        except Exception as e:
+            logger.warning(f"Could not update fetch limiter: {e}")
+
+
+def backoff_countdown(retries):
+    """Exponential backoff with full jitter for Celery retries."""
+    cap = app.config['RETRY_BACKOFF_MAX']
+    return random.uniform(0, min(cap, app.config['RETRY_BACKOFF_BASE'] * (2 ** retries)))
+
+
+def get_limiter_stats():
+    """Current shared limit, in-flight fetches and outcome counters."""
+    if redis_conn is None:
+        return {"error": "Redis is not connected"}
+    stats = redis_conn.hgetall(STATS_KEY) or {}
+    return {
+        "limit": float(redis_conn.get(LIMIT_KEY) or app.config['FETCH_LIMIT_INITIAL']),
+        "in_flight": redis_conn.zcount(LEASES_KEY, time.time(), "+inf"),
+        **stats
+    }
@@ -1,16 +1,21 @@
-from flask import jsonify, request, session, redirect, url_for, send_file
+from flask import jsonify, request, session, redirect, url_for, Response, stream_with_context
 from app import app, es, logger, celery, redis_conn
-from app.auth import get_auth_url, get_credentials, SCOPES, get_client_config
+from app.auth import get_auth_url, get_credentials, SCOPES, get_client_config, get_client_build_stats
 from app.youtube import get_user_playlists, build_youtube_client
-from app.elastic import search_videos, create_metadata_index, get_indexed_playlists_metadata, get_channels_for_playlist, export_playlist_data
-from app.tasks import index_playlist_task
+from app.elastic import search_videos, search_video_matches, search_all_playlists, open_search_pit, close_search_pit, suggest_completions, create_metadata_index, get_indexed_playlists_metadata, get_channels_for_playlist, iter_playlist_export, delete_playlist_indexes, get_playlist_index
+from app.tasks import index_playlist_task, retry_dead_letters_task
+from app.checkpoint import get_dead_letters, clear_checkpoint
+from app.cursors import save_cursor, load_cursor
+from app.fetcher import get_all_fetcher_stats
+from app.progress import stream_progress, publish_status
+from app.ratelimit import get_limiter_stats
+from app.cache import get_cached_search, set_cached_search, get_cached_channels, set_cached_channels, bump_index_generation, get_search_cache_stats, get_transcript_cache_stats, get_youtube_cache_stats
 from celery.result import AsyncResult, GroupResult
-import os
 from google_auth_oauthlib.flow import Flow
-import json
 from datetime import datetime
-import tempfile
+import zlib
 import traceback
+import time
 from youtube_transcript_api import YouTubeTranscriptApi
 
 # Define a key prefix for Redis
@@ -112,12 +117,27 @@ def auth_status():
         return jsonify({"authenticated": True})
     return jsonify({"authenticated": False})
 
+USER_PLAYLISTS_SESSION_TTL = 600
+
+def _remember_user_playlists(playlists):
+    session['playlist_ids'] = {"ids": [p['id'] for p in playlists], "at": time.time()}
+
+def _user_playlist_ids():
+    """The caller's YouTube playlist IDs, cached in the session for a few minutes."""
+    cached = session.get('playlist_ids')
+    if cached and time.time() - cached.get("at", 0) < USER_PLAYLISTS_SESSION_TTL:
+        return set(cached["ids"])
+    playlists = get_user_playlists()
+    _remember_user_playlists(playlists)
+    return {p['id'] for p in playlists}
+
 @app.route('/api/playlists')
 def playlists():
     if not get_credentials():
         return jsonify({"error": "Not authenticated"}), 401
     
     playlists = get_user_playlists()
+    _remember_user_playlists(playlists)
     
     logger.info(f"Found {len(playlists)} playlists: {len([p for p in playlists if p.get('isOwn', False)])} owned, {len([p for p in playlists if not p.get('isOwn', False)])} saved")
     
@@ -164,6 +184,25 @@ def get_indexing_status():
     
     return jsonify({ "status": "not_started", "progress": 0, "total": 0 })
 
+@app.route('/api/playlist/<playlist_id>/progress-stream')
+def indexing_progress_stream(playlist_id):
+    """Server-Sent Events stream of indexing progress, fed by Redis pub/sub."""
+    if not get_credentials():
+        return jsonify({"error": "Not authenticated"}), 401
+
+    if redis_conn is None:
+        return jsonify({"error": "Task server is disconnected"}), 503
+
+    return Response(
+        stream_with_context(stream_progress(playlist_id)),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.route('/api/playlist/<playlist_id>/index', methods=['POST'])
 def index_playlist(playlist_id):
     """Start indexing a playlist."""
@@ -259,6 +298,7 @@ def cancel_indexing(playlist_id):
                 group_result.revoke(terminate=True, signal='SIGTERM')
             
         redis_conn.delete(task_id_key)
+        publish_status(playlist_id, {"status": "cancelled", "id": playlist_id, "message": "Indexing cancelled"})
         
         logger.info(f"Indexing cancelled for playlist {playlist_id}")
         
@@ -269,6 +309,60 @@ def cancel_indexing(playlist_id):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/playlist/<playlist_id>/failed-videos')
+def get_failed_videos(playlist_id):
+    """Videos that exhausted their retries during indexing."""
+    if not get_credentials():
+        return jsonify({"error": "Not authenticated"}), 401
+
+    if redis_conn is None:
+        return jsonify({"error": "Task server is disconnected"}), 503
+
+    dead_letters = get_dead_letters(playlist_id)
+    return jsonify({
+        "playlist_id": playlist_id,
+        "count": len(dead_letters),
+        "videos": [
+            {
+                "id": item["video"].get("id"),
+                "title": item["video"].get("title"),
+                "error": item.get("error"),
+                "failed_at": item.get("failed_at")
+            }
+            for item in dead_letters
+        ]
+    })
+
+@app.route('/api/playlist/<playlist_id>/retry-failed', methods=['POST'])
+def retry_failed_videos(playlist_id):
+    """Re-queue only the videos sitting in the playlist's dead-letter list."""
+    if not get_credentials():
+        return jsonify({"error": "Not authenticated"}), 401
+
+    if redis_conn is None:
+        return jsonify({"error": "Task server is disconnected"}), 503
+
+    task_id_key = f"{TASK_KEY_PREFIX}{playlist_id}"
+    existing_task_id = redis_conn.get(task_id_key)
+    if existing_task_id:
+        result = AsyncResult(existing_task_id, app=celery)
+        if result.state in ['PENDING', 'PROGRESS']:
+            return jsonify({"error": "Playlist is already being indexed"}), 409
+
+    if not get_dead_letters(playlist_id):
+        return jsonify({"error": "No failed videos to retry"}), 404
+
+    try:
+        data = request.get_json(silent=True) or {}
+        task = retry_dead_letters_task.delay(playlist_id, data.get('title', playlist_id))
+        # Reuse the indexing task slot so the status endpoints and cancel work unchanged
+        redis_conn.set(task_id_key, task.id, ex=7200)
+        return jsonify({"success": True, "message": "Retry added to queue"})
+    except Exception as e:
+        logger.error(f"Error retrying failed videos: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/playlist/<playlist_id>/search')
 def search_playlist(playlist_id):
     try:
@@ -283,17 +377,42 @@ def search_playlist(playlist_id):
         size = int(request.args.get('size', 10))
         search_in = request.args.getlist('search_in')
         channels = request.args.getlist('channel')
+        cursor = request.args.get('cursor')
+        
+        if cursor:
+            return _search_page_from_cursor(playlist_id, cursor)
         
         if not query:
             return jsonify({"error": "Query parameter 'q' is required"}), 400
         
-        index_name = f"playlist_{playlist_id.lower()}"
+        index_name = get_playlist_index(playlist_id)
         if not es.indices.exists(index=index_name):
             return jsonify({"error": "Playlist not indexed yet"}), 404
         
+        if cursor is not None:
+            # An empty ?cursor= starts a point-in-time search paged with cursors
+            state = {
+                'playlist_id': playlist_id,
+                'index_name': index_name,
+                'query': query,
+                'search_in': search_in,
+                'channels': channels,
+                'size': size,
+                'page': 0,
+                'pit_id': open_search_pit(index_name, f"{app.config['SEARCH_CURSOR_TTL']}s"),
+                'search_after': None
+            }
+            return _search_cursor_page(state)
+        
+        cached = get_cached_search(playlist_id, query, search_in, channels, page, size)
+        if cached is not None:
+            return jsonify(cached)
+        
         from_pos = (page - 1) * size
         channel_filter = channels if channels else None
         results = search_videos(index_name, query, size, from_pos, search_in, channel_filter)
+        if 'error' not in results:
+            set_cached_search(playlist_id, query, search_in, channels, page, size, results)
         return jsonify(results)
         
     except Exception as e:
@@ -301,6 +420,135 @@ def search_playlist(playlist_id):
         traceback.print_exc()
         return jsonify({'total': 0, 'results': [], 'error': str(e)}), 500
 
+@app.route('/api/playlist/<playlist_id>/video/<video_id>/matches')
+def video_matches(playlist_id, video_id):
+    """Page through every transcript match of one search result."""
+    try:
+        if not get_credentials():
+            return jsonify({"error": "Not authenticated"}), 401
+
+        if es is None:
+            return jsonify({'total': 0, 'matches': [], 'error': 'Search service is temporarily unavailable.'}), 503
+
+        query = request.args.get('q', '')
+        offset = max(int(request.args.get('offset', 0)), 0)
+        size = min(max(int(request.args.get('size', 20)), 1), 100)
+
+        if not query:
+            return jsonify({"error": "Query parameter 'q' is required"}), 400
+
+        index_name = get_playlist_index(playlist_id)
+        if not es.indices.exists(index=index_name):
+            return jsonify({"error": "Playlist not indexed yet"}), 404
+
+        results = search_video_matches(index_name, video_id, query, offset, size)
+        if 'error' in results:
+            return jsonify(results), 500
+        return jsonify(results)
+
+    except Exception as e:
+        logger.error(f"Video matches error: {e}")
+        traceback.print_exc()
+        return jsonify({'total': 0, 'matches': [], 'error': str(e)}), 500
+
+def _search_page_from_cursor(playlist_id, token):
+    state = load_cursor(token)
+    if state is None or state.get('playlist_id') != playlist_id:
+        return jsonify({"error": "Search cursor expired, run the search again"}), 410
+    return _search_cursor_page(state)
+
+def _search_cursor_page(state):
+    """
+    Fetch the page after the one recorded in a cursor state. Every page costs
+    the same however deep it is; the point in time is closed once the last
+    page has been served and otherwise expires with the cursor.
+    """
+    keep_alive = f"{app.config['SEARCH_CURSOR_TTL']}s"
+    pit = {'id': state['pit_id'], 'keep_alive': keep_alive, 'search_after': state['search_after']}
+    results = search_videos(
+        state['index_name'], state['query'], state['size'], 0,
+        state['search_in'], state['channels'] or None, pit=pit
+    )
+    if 'error' in results:
+        close_search_pit(state['pit_id'])
+        return jsonify(results), 500
+
+    state['page'] += 1
+    state['pit_id'] = results.pop('pit_id')
+    state['search_after'] = results.pop('search_after')
+    results['page'] = state['page']
+    results['cursor'] = None
+    if state['search_after']:
+        results['cursor'] = save_cursor(state)
+    else:
+        close_search_pit(state['pit_id'])
+    return jsonify(results)
+
+@app.route('/api/search')
+def search_all():
+    """Search every playlist the caller owns or saved that has been indexed."""
+    try:
+        if not get_credentials():
+            return jsonify({"error": "Not authenticated"}), 401
+
+        if es is None:
+            return jsonify({'total': 0, 'results': [], 'error': 'Search service is temporarily unavailable.'}), 503
+
+        query = request.args.get('q', '')
+        page = int(request.args.get('page', 1))
+        size = int(request.args.get('size', 10))
+        search_in = request.args.getlist('search_in')
+        channels = request.args.getlist('channel')
+
+        if not query:
+            return jsonify({"error": "Query parameter 'q' is required"}), 400
+
+        own_ids = _user_playlist_ids()
+        searchable = [meta for meta in get_indexed_playlists_metadata() if meta.get('playlist_id') in own_ids]
+        if not searchable:
+            return jsonify({'total': 0, 'results': [], 'channels': [], 'playlists_searched': 0})
+
+        index_to_playlist = {
+            get_playlist_index(meta['playlist_id']): {'id': meta['playlist_id'], 'title': meta.get('title')}
+            for meta in searchable
+        }
+        results = search_all_playlists(
+            list(index_to_playlist), query, size, (page - 1) * size, search_in, channels or None
+        )
+        for result in results.get('results', []):
+            result['playlists'] = [index_to_playlist[name] for name in result['playlists'] if name in index_to_playlist]
+        results['playlists_searched'] = len(index_to_playlist)
+        return jsonify(results)
+
+    except Exception as e:
+        logger.error(f"Cross-playlist search error: {e}")
+        traceback.print_exc()
+        return jsonify({'total': 0, 'results': [], 'error': str(e)}), 500
+
+@app.route('/api/playlist/<playlist_id>/suggest')
+def suggest_playlist(playlist_id):
+    """Search-box completions from titles and frequent transcript phrases."""
+    try:
+        if not get_credentials():
+            return jsonify({"error": "Not authenticated"}), 401
+
+        if es is None:
+            return jsonify({"suggestions": [], "error": "Search service is temporarily unavailable."}), 503
+
+        prefix = request.args.get('q', '').strip()
+        size = min(int(request.args.get('size', 8)), 20)
+        if not prefix:
+            return jsonify({"suggestions": []})
+
+        index_name = get_playlist_index(playlist_id)
+        if not es.indices.exists(index=index_name):
+            return jsonify({"error": "Playlist not indexed yet"}), 404
+        return jsonify({"suggestions": suggest_completions(index_name, prefix, size)})
+
+    except Exception as e:
+        logger.error(f"Suggest error: {e}")
+        return jsonify({"suggestions": [], "error": str(e)}), 500
+
 @app.route('/api/playlist/<playlist_id>/channels')
 def get_playlist_channels(playlist_id):
     try:
@@ -310,11 +558,14 @@ def get_playlist_channels(playlist_id):
         if es is None:
             return jsonify({"error": "Search service is temporarily unavailable."}), 503
 
-        index_name = f"playlist_{playlist_id.lower()}"
+        index_name = get_playlist_index(playlist_id)
         if not es.indices.exists(index=index_name):
             return jsonify({"error": "Playlist not indexed yet"}), 404
         
-        channels = get_channels_for_playlist(index_name)
+        channels = get_cached_channels(playlist_id)
+        if channels is None:
+            channels = get_channels_for_playlist(index_name)
+            set_cached_channels(playlist_id, channels)
         return jsonify({"channels": channels})
         
     except Exception as e:
@@ -330,11 +581,11 @@ def delete_playlist_index(playlist_id):
         return jsonify({"error": "Search service is temporarily unavailable."}), 503
 
     try:
-        index_name = f"playlist_{playlist_id.lower()}"
+        index_name = get_playlist_index(playlist_id)
         if not es.indices.exists(index=index_name):
             return jsonify({"error": "Playlist not indexed"}), 404
         
-        es.indices.delete(index=index_name)
+        delete_playlist_indexes(index_name)
         
         es.delete(
             index="yts_metadata",
@@ -345,6 +596,8 @@ def delete_playlist_index(playlist_id):
         
         if redis_conn:
             redis_conn.delete(f"{TASK_KEY_PREFIX}{playlist_id}")
+            clear_checkpoint(playlist_id, dead_letters=True)
+        bump_index_generation(playlist_id)
         
         return jsonify({
             "success": True,
@@ -369,6 +622,10 @@ def get_indexed_playlists():
 
 @app.route('/api/playlist/<playlist_id>/export', methods=['GET'])
 def export_playlist(playlist_id):
+    """
+    Stream the playlist export straight from Elasticsearch.
+    ?format=json (default) or ndjson, ?gzip=1 for a gzip-compressed body.
+    """
     try:
         if 'credentials' not in session:
             return jsonify({"error": "Not authenticated"}), 401
@@ -376,21 +633,42 @@ def export_playlist(playlist_id):
         if es is None:
             return jsonify({"error": "Search service is temporarily unavailable."}), 503
             
-        index_name = f"playlist_{playlist_id.lower()}"
-        
-        data, success = export_playlist_data(index_name)
-        if not success:
-            return jsonify(data), 404
-            
-        with tempfile.NamedTemporaryFile(delete=False, mode='w', suffix='.json', encoding='utf-8') as temp_file:
-            json.dump(data, temp_file, indent=2)
-            temp_path = temp_file.name
-            
-        return send_file(
-            temp_path,
-            as_attachment=True,
-            download_name=f"playlist_{playlist_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mimetype='application/json'
+        index_name = get_playlist_index(playlist_id)
+        if not es.indices.exists(index=index_name):
+            return jsonify({"error": f"Index {index_name} does not exist"}), 404
+
+        fmt = request.args.get('format', 'json').lower()
+        if fmt not in ('json', 'ndjson'):
+            return jsonify({"error": "format must be 'json' or 'ndjson'"}), 400
+        use_gzip = request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
+
+        def generate():
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if use_gzip else None
+            try:
+                for chunk in iter_playlist_export(index_name, playlist_id, fmt):
+                    data = chunk.encode('utf-8')
+                    if compressor:
+                        data = compressor.compress(data)
+                    if data:
+                        yield data
+                if compressor:
+                    yield compressor.flush()
+            except Exception as e:
+                # Headers are already sent; log and end the stream
+                logger.error(f"Export stream for {playlist_id} aborted: {e}")
+                traceback.print_exc()
+
+        extension = 'ndjson' if fmt == 'ndjson' else 'json'
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+        filename = f"playlist_{playlist_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+        if use_gzip:
+            filename += '.gz'
+            mimetype = 'application/gzip'
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
         )
         
     except Exception as e:
@@ -398,9 +676,6 @@ def export_playlist(playlist_id):
         logger.error(f"Error in export_playlist endpoint: {error_message}")
         traceback.print_exc()
         return jsonify({"error": error_message}), 500
-    finally:
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.remove(temp_path)
 
 @app.route('/api/debug/index/<index_name>')
 def debug_index(index_name):
@@ -433,6 +708,20 @@ def debug_index(index_name):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/debug/cache-stats')
+def debug_cache_stats():
+    try:
+        return jsonify({
+            "search_cache": get_search_cache_stats(),
+            "transcript_cache": get_transcript_cache_stats(),
+            "transcript_fetchers": get_all_fetcher_stats(),
+            "fetch_limiter": get_limiter_stats(),
+            "youtube_client": get_client_build_stats(),
+            "youtube_listings": get_youtube_cache_stats()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/debug/transcript/<video_id>')
 def debug_transcript(video_id):
     try:
@@ -1,34 +1,257 @@
-from app import celery, logger
-from app.youtube import get_playlist_videos, get_video_transcript
-from app.elastic import create_index, index_video, save_playlist_metadata, get_indexed_video_ids
+from app import app, celery, logger
+from app.youtube import iter_playlist_video_pages, get_video_transcript
+from app.cache import bump_index_generation, set_cached_channels
+from app.ratelimit import backoff_countdown
+from app.checkpoint import save_checkpoint, save_listing_checkpoint, load_checkpoint, clear_checkpoint, mark_videos_done, add_dead_letters, get_dead_letters, drop_dead_letters
+from app.progress import publish_status, record_video_result, record_video_results, reset_progress, extend_progress, get_progress_counts
+from app.elastic import get_channels_for_playlist, create_index, index_video, index_videos, refresh_index, save_playlist_metadata, get_playlist_index, copy_indexed_videos, get_indexed_video_fields, changed_metadata, delete_videos, update_video_metadata
 from celery import group
+from celery.utils import uuid
+from celery.result import GroupResult
 from celery.exceptions import MaxRetriesExceededError
+from concurrent.futures import ThreadPoolExecutor
 import time
 from datetime import datetime
 
+def _report(task, status_meta):
+    """Update the Celery task state and push the same status to SSE subscribers."""
+    task.update_state(state='PROGRESS', meta=status_meta)
+    publish_status(status_meta["id"], status_meta)
+
 @celery.task(bind=True, max_retries=3)
-def process_video_task(self, video_data, index_name):
+def process_video_task(self, video_data, index_name, playlist_id=None):
     try:
         # 1. Try to get transcript
         transcript = get_video_transcript(video_data['id'])
         
-        # 2. Index whatever we got
-        if index_video(index_name, video_data, transcript):
+        # 2. Index whatever we got (buffered bulk write, no refresh)
+        errors = index_video(index_name, video_data, transcript)
+        if not errors:
+            mark_videos_done(playlist_id, [video_data['id']])
+            record_video_result(playlist_id, video_data['id'], True)
             return (video_data['id'], True)
+
+        # Per-document bulk failures go through the same retry path as fetch errors
+        raise Exception(f"Bulk indexing rejected document: {errors[0].get('error')}")
             
     except Exception as e:
+        # retry(exc=e) re-raises e once retries run out, so give up here first
+        if self.request.retries >= self.max_retries:
+            logger.error(f"Failed to fetch {video_data['id']} after {self.max_retries} retries. Moving to dead letters.")
+            add_dead_letters(playlist_id, [(video_data, e)])
+            record_video_result(playlist_id, video_data['id'], False)
+            return (video_data['id'], False)
+
         # 3. Handle Proxy/Network Errors -> RETRY
         logger.warning(f"Error/Proxy fail for {video_data['id']}: {e}. Retrying...")
+        # Back off exponentially with jitter, then restart task (picking new proxy)
+        raise self.retry(exc=e, countdown=backoff_countdown(self.request.retries))
+
+def _fetch_transcripts(videos):
+    """
+    Fetch transcripts for a batch concurrently (greenlets under the gevent
+    worker). Returns ([(video, transcript), ...], {video_id: exception}).
+    """
+    fetched = []
+    errors = {}
+    workers = max(min(app.config['BATCH_FETCH_CONCURRENCY'], len(videos)), 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [(video, executor.submit(get_video_transcript, video['id'])) for video in videos]
+        for video, future in futures:
+            try:
+                fetched.append((video, future.result()))
+            except Exception as e:
+                errors[video['id']] = e
+    return fetched, errors
+
+@celery.task(bind=True, max_retries=3)
+def process_video_batch_task(self, videos, index_name, playlist_id=None):
+    """Fetch a chunk of videos concurrently and index them with a single bulk request."""
+    fetched, errors = _fetch_transcripts(videos)
+
+    index_failures = index_videos(index_name, fetched) if fetched else {}
+    for video_id, video_errors in index_failures.items():
+        errors[video_id] = Exception(f"Bulk indexing rejected document: {video_errors[0].get('error')}")
+
+    results = [(video['id'], True) for video, _ in fetched if video['id'] not in index_failures]
+    mark_videos_done(playlist_id, [video_id for video_id, _ in results])
+    record_video_results(playlist_id, results)
+
+    if errors:
+        failed_videos = [video for video in videos if video['id'] in errors]
+        logger.warning(f"{len(failed_videos)}/{len(videos)} videos in batch failed. Retrying them...")
         try:
-            # Wait 1 second, then restart task (picking new proxy)
-            raise self.retry(exc=e, countdown=1)
+            # Only the failed videos are retried
+            raise self.retry(args=(failed_videos, index_name, playlist_id), countdown=backoff_countdown(self.request.retries))
         except MaxRetriesExceededError:
-            logger.error(f"Failed to fetch {video_data['id']} after 3 attempts. Skipping.")
-            return (video_data['id'], False)
+            logger.error(f"Giving up on {len(failed_videos)} videos after 3 attempts. Moving to dead letters.")
+            add_dead_letters(playlist_id, [(video, errors[video['id']]) for video in failed_videos])
+            failed = [(video['id'], False) for video in failed_videos]
+            record_video_results(playlist_id, failed)
+            results.extend(failed)
+
+    return results
+
+def _build_fetch_tasks(videos_to_fetch, index_name, playlist_id):
+    batch_size = app.config['INDEX_BATCH_SIZE']
+    if batch_size > 1:
+        # One broker message and one bulk write per chunk of videos
+        return [
+            process_video_batch_task.s(videos_to_fetch[i:i + batch_size], index_name, playlist_id)
+            for i in range(0, len(videos_to_fetch), batch_size)
+        ]
+    return [process_video_task.s(video, index_name, playlist_id) for video in videos_to_fetch]
+
+def _dispatch_fetches(status_meta, videos_to_fetch, index_name, playlist_id, results):
+    """
+    Queue fetch tasks and keep every result queued so far saved as one
+    GroupResult under status_meta["group_id"], so cancelling revokes them all.
+    """
+    if not videos_to_fetch:
+        return
+    results.extend(group(_build_fetch_tasks(videos_to_fetch, index_name, playlist_id)).apply_async().results)
+    status_meta.setdefault("group_id", uuid())
+    GroupResult(status_meta["group_id"], results, app=celery).save()
+
+def _wait_for_fetches(task, status_meta, playlist_id, results, expected):
+    """
+    Mirror the fetch progress into the task state until the done and failed
+    counters account for all expected videos; return the success count.
+    The GroupResult is only polled when the counters are unavailable, since
+    ready() reads every task's result from the backend.
+    """
+    result_group = GroupResult(status_meta["group_id"], results, app=celery)
+    status_meta["message"] = "Downloading transcripts..."
+    status_meta["status"] = "in_progress"
+    _report(task, status_meta)
+    
+    # Workers publish per-video progress themselves; this loop only
+    # mirrors the Redis counters into the task state for the polling
+    # endpoint, and only when they changed.
+    last_finished = -1
+    while True:
+        counts = get_progress_counts(playlist_id)
+        finished = counts.get("done", 0) + counts.get("failed", 0)
+        if finished >= expected or (not counts and result_group.ready()):
+            break
+        if finished != last_finished:
+            last_finished = finished
+            total_videos = counts.get("total", status_meta["total"])
+            status_meta["progress"] = finished + counts.get("skipped", 0)
+            status_meta["new_videos_count"] = counts.get("done", 0)
+            
+            # Show percentage
+            pct = int((status_meta["progress"] / max(total_videos, 1)) * 100)
+            status_meta["message"] = f"Indexing: {pct}% ({status_meta['progress']}/{total_videos})"
+            task.update_state(state='PROGRESS', meta=status_meta)
+        time.sleep(2) 
     
-    return (video_data['id'], False)
+    counts = get_progress_counts(playlist_id)
+    new_videos_count = counts["done"] if "done" in counts else result_group.completed_count()
+    status_meta["new_videos_count"] = new_videos_count
+    status_meta["progress"] = counts.get("skipped", 0) + new_videos_count
+    _report(task, status_meta)
+    return new_videos_count
 
-@celery.task(bind=True)
+def _stream_indexing_run(task, status_meta, playlist_id, index_name, credentials, incremental, results, resume_done=None):
+    """
+    List the playlist page by page and dispatch transcript work for each
+    page as soon as its details arrive, so listing and fetching overlap.
+
+    Incremental runs classify each page against the stored metadata; removed
+    videos can only be known once the listing ends. resume_done (video IDs
+    completed by an earlier run interrupted mid-listing) keeps the index and
+    skips what that run already indexed. Returns
+    (videos, videos_to_fetch, skipped_count, extra), or None for an
+    empty/private playlist.
+    """
+    # --- UI STATUS UPDATE ---
+    status_meta["message"] = "Fetching video list from YouTube..."
+    _report(task, status_meta)
+
+    videos = []
+    videos_to_fetch = []
+    seen = set()
+    indexed = None
+    updated = {}
+    unchanged = 0
+    copied = 0
+
+    for page, total_results in iter_playlist_video_pages(playlist_id, credentials):
+        if indexed is None:
+            # Only touch the index once the playlist turned out to have videos
+            create_index(index_name, recreate=not incremental and resume_done is None)
+            if resume_done is not None:
+                refresh_index(index_name)
+            indexed = get_indexed_video_fields(index_name) if incremental or resume_done is not None else {}
+            for video_id in resume_done or ():
+                indexed.setdefault(video_id, None)
+            save_listing_checkpoint(playlist_id, incremental)
+            reset_progress(playlist_id, total_results, 0)
+
+        page_fetch = []
+        page_new = 0
+        for video in page:
+            if video['id'] in seen:
+                continue
+            seen.add(video['id'])
+            videos.append(video)
+            page_new += 1
+
+            if video['id'] not in indexed:
+                page_fetch.append(video)
+                continue
+            stored = indexed[video['id']]
+            # A resumed full run only skips what it already indexed
+            changed = changed_metadata(video, stored) if incremental and stored is not None else None
+            if changed:
+                updated[video['id']] = changed
+            else:
+                unchanged += 1
+
+        # Videos another playlist already indexed are copied, not refetched
+        if page_fetch and app.config['DEDUPE_ACROSS_PLAYLISTS']:
+            copied_ids = copy_indexed_videos(index_name, page_fetch)
+            if copied_ids:
+                page_fetch = [video for video in page_fetch if video['id'] not in copied_ids]
+                copied += len(copied_ids)
+
+        extend_progress(playlist_id, total=max(total_results, len(videos)), skipped=page_new - len(page_fetch))
+        _dispatch_fetches(status_meta, page_fetch, index_name, playlist_id, results)
+        videos_to_fetch.extend(page_fetch)
+
+        status_meta["total"] = max(total_results, len(videos))
+        status_meta["status"] = "in_progress"
+        status_meta["message"] = f"Listed {len(videos)} videos, downloading transcripts..."
+        _report(task, status_meta)
+
+    if not videos:
+        return None
+
+    extra = {}
+    if incremental:
+        removed = [video_id for video_id in indexed if video_id not in seen]
+        delete_errors = delete_videos(index_name, removed)
+        update_errors = update_video_metadata(index_name, updated)
+
+        extra["already_indexed"] = unchanged + len(updated)
+        extra["changes"] = {
+            "added": len(videos) - unchanged - len(updated),
+            "removed": len(removed),
+            "updated": len(updated),
+            "unchanged": unchanged,
+            "errors": len(delete_errors) + len(update_errors)
+        }
+    if app.config['DEDUPE_ACROSS_PLAYLISTS']:
+        extra["copied"] = copied
+    status_meta.update(extra)
+
+    # totalResults also counts deleted/private entries; settle on what was listed
+    status_meta["total"] = len(videos)
+    extend_progress(playlist_id, total=len(videos))
+    return videos, videos_to_fetch, len(videos) - len(videos_to_fetch), extra
+
+@celery.task(bind=True, acks_late=True, reject_on_worker_lost=True)
 def index_playlist_task(self, playlist_id, playlist_title, credentials_dict, incremental=False):
     status_meta = {
         "status": "starting", 
@@ -41,82 +264,61 @@ def index_playlist_task(self, playlist_id, playlist_title, credentials_dict, inc
     }
     
     try:
-        # --- UI STATUS UPDATE ---
-        status_meta["message"] = "Fetching video list from YouTube (this may take a minute)..."
-        self.update_state(state='PROGRESS', meta=status_meta)
-        
-        credentials = credentials_dict 
+        index_name = get_playlist_index(playlist_id)
+        checkpoint = load_checkpoint(playlist_id)
+        results = []
 
-        videos = get_playlist_videos(playlist_id, credentials)
-        
-        if not videos:
-            status_meta["total"] = 0
-            status_meta["status"] = "completed"
-            status_meta["message"] = "Playlist is empty or private."
-            return status_meta
-            
-        total_videos = len(videos)
-        status_meta["total"] = total_videos
-        status_meta["message"] = f"Found {total_videos} videos. Preparing database..."
-        self.update_state(state='PROGRESS', meta=status_meta)
-        
-        index_name = f"playlist_{playlist_id.lower()}"
-        create_index(index_name, recreate=not incremental)
-        
-        already_indexed_ids = []
-        if incremental:
-            status_meta["message"] = "Checking existing videos..."
-            self.update_state(state='PROGRESS', meta=status_meta)
-            already_indexed_ids = get_indexed_video_ids(index_name)
-            status_meta["already_indexed"] = len(already_indexed_ids)
-        
-        status_meta["message"] = "Queueing download tasks..."
-        self.update_state(state='PROGRESS', meta=status_meta)
-        
-        tasks_to_run = []
-        skipped_count = 0
-        
-        for video in videos:
-            if incremental and video['id'] in already_indexed_ids:
-                skipped_count += 1
+        if checkpoint and not checkpoint["listing"] and checkpoint["incremental"] == incremental:
+            # --- RESUME: skip listing/diffing, never recreate the index ---
+            videos = checkpoint["videos"]
+            videos_to_fetch = checkpoint["pending"]
+            status_meta.update(checkpoint["extra"])
+            status_meta["resumed"] = True
+            status_meta["total"] = len(videos)
+            status_meta["message"] = f"Resuming: {len(videos_to_fetch)} videos left..."
+            _report(self, status_meta)
+            create_index(index_name, recreate=False)
+            # Videos finished before the interruption count as already done
+            skipped_count = checkpoint["skipped"] + len(checkpoint["done"])
+            reset_progress(playlist_id, len(videos), skipped_count)
+            _dispatch_fetches(status_meta, videos_to_fetch, index_name, playlist_id, results)
+        else:
+            resume_done = None
+            if checkpoint and checkpoint["listing"]:
+                # Interrupted while listing: list again into the same index
+                resume_done = checkpoint["done"]
+                status_meta["resumed"] = True
             else:
-                tasks_to_run.append(process_video_task.s(video, index_name))
+                # A fresh run refetches whatever earlier runs gave up on
+                clear_checkpoint(playlist_id, dead_letters=True)
+            plan = _stream_indexing_run(self, status_meta, playlist_id, index_name, credentials_dict, incremental, results, resume_done)
+            if plan is None:
+                status_meta["total"] = 0
+                status_meta["status"] = "completed"
+                status_meta["message"] = "Playlist is empty or private."
+                publish_status(playlist_id, status_meta)
+                return status_meta
+            videos, videos_to_fetch, skipped_count, extra = plan
+            save_checkpoint(playlist_id, videos, videos_to_fetch, skipped_count, incremental, extra)
 
+        total_videos = len(videos)
         status_meta["skipped"] = skipped_count
         
-        if not tasks_to_run:
+        if not results:
             new_videos_count = 0
-            total_success = skipped_count + len(already_indexed_ids)
             status_meta["message"] = "All videos already indexed."
         else:
-            job_group = group(tasks_to_run)
-            result_group = job_group.apply_async()
-            
-            status_meta["group_id"] = result_group.id
-            status_meta["message"] = "Downloading transcripts..."
-            status_meta["status"] = "in_progress"
-            self.update_state(state='PROGRESS', meta=status_meta)
-            
-            while not result_group.ready():
-                completed_count = result_group.completed_count()
-                status_meta["progress"] = completed_count + skipped_count
-                status_meta["new_videos_count"] = completed_count
-                
-                # Show percentage
-                pct = int((status_meta["progress"] / total_videos) * 100)
-                status_meta["message"] = f"Indexing: {pct}% ({status_meta['progress']}/{total_videos})"
-                
-                self.update_state(state='PROGRESS', meta=status_meta)
-                time.sleep(2) 
-            
-            new_videos_count = result_group.completed_count()
-            total_success = skipped_count + len(already_indexed_ids) + new_videos_count
-            
-            status_meta["progress"] = skipped_count + new_videos_count
-            self.update_state(state='PROGRESS', meta=status_meta)
+            new_videos_count = _wait_for_fetches(self, status_meta, playlist_id, results, len(videos_to_fetch))
+        total_success = skipped_count + new_videos_count
         
         status_meta["message"] = "Finalizing..."
-        self.update_state(state='PROGRESS', meta=status_meta)
+        _report(self, status_meta)
+
+        # Single refresh for the whole run instead of one per video
+        refresh_index(index_name)
+        bump_index_generation(playlist_id)
+        # Precompute the channel facets for the new generation
+        set_cached_channels(playlist_id, get_channels_for_playlist(index_name))
         
         playlist_data = {
             "id": playlist_id,
@@ -125,10 +327,12 @@ def index_playlist_task(self, playlist_id, playlist_title, credentials_dict, inc
             "thumbnail": videos[0].get("thumbnail", "") if videos else ""
         }
         save_playlist_metadata(playlist_data, total_success)
+        clear_checkpoint(playlist_id)
         
         status_meta["status"] = "completed"
         status_meta["message"] = "Indexing complete!"
         status_meta["success_count"] = total_success
+        status_meta["failed_count"] = len(get_dead_letters(playlist_id))
         
         status_meta["indexed_data"] = {
             "playlist_id": playlist_id,
@@ -139,6 +343,7 @@ def index_playlist_task(self, playlist_id, playlist_title, credentials_dict, inc
             "last_indexed": datetime.utcnow().isoformat()
         }
         
+        publish_status(playlist_id, status_meta)
         return status_meta
         
     except Exception as e:
@@ -146,4 +351,54 @@ def index_playlist_task(self, playlist_id, playlist_title, credentials_dict, inc
         status_meta["status"] = "failed"
         status_meta["error"] = str(e)
         self.update_state(state='FAILURE', meta=status_meta)
-        raise e
\ No newline at end of file
+        publish_status(playlist_id, status_meta)
+        raise e
+
+@celery.task(bind=True)
+def retry_dead_letters_task(self, playlist_id, playlist_title=None):
+    """Re-run only the videos that exhausted their retries in earlier runs."""
+    status_meta = {
+        "status": "starting",
+        "message": "Retrying failed videos...",
+        "progress": 0,
+        "total": 0,
+        "incremental": True,
+        "title": playlist_title or playlist_id,
+        "id": playlist_id
+    }
+    try:
+        index_name = get_playlist_index(playlist_id)
+        # Read, not popped: the letters are only dropped once their videos are re-queued
+        dead_letters = get_dead_letters(playlist_id)
+        videos = [item["video"] for item in dead_letters]
+        status_meta["total"] = len(videos)
+        if not videos:
+            status_meta["status"] = "completed"
+            status_meta["message"] = "No failed videos to retry."
+            publish_status(playlist_id, status_meta)
+            return status_meta
+
+        results = []
+        reset_progress(playlist_id, len(videos), 0)
+        _dispatch_fetches(status_meta, videos, index_name, playlist_id, results)
+        drop_dead_letters(playlist_id, len(dead_letters))
+        new_videos_count = _wait_for_fetches(self, status_meta, playlist_id, results, len(videos))
+        refresh_index(index_name)
+        bump_index_generation(playlist_id)
+        # Precompute the channel facets for the new generation
+        set_cached_channels(playlist_id, get_channels_for_playlist(index_name))
+
+        status_meta["status"] = "completed"
+        status_meta["message"] = f"Recovered {new_videos_count} of {len(videos)} failed videos."
+        status_meta["success_count"] = new_videos_count
+        status_meta["failed_count"] = len(get_dead_letters(playlist_id))
+        publish_status(playlist_id, status_meta)
+        return status_meta
+
+    except Exception as e:
+        logger.error(f"Error retrying failed videos for {playlist_id}: {e}")
+        status_meta["status"] = "failed"
+        status_meta["error"] = str(e)
+        self.update_state(state='FAILURE', meta=status_meta)
+        publish_status(playlist_id, status_meta)
+        raise e
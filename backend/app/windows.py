@@ -0,0 +1,70 @@
+import re
+
+_MARK_RE = re.compile(r"<mark>(.*?)</mark>", re.S)
+
+
+def build_transcript_windows(segments, window_seconds, overlap=0):
+    """
+    Group caption segments into overlapping time windows of window_seconds,
+    starting every (window_seconds - overlap) seconds. A segment belongs to
+    every window its start falls into; empty and repeated windows are skipped.
+
+    Each window owns the segments starting in its first (window_seconds -
+    overlap) seconds (plus the range of any repeated window skipped after
+    it); owned_chars is where the unowned tail starts in its text, so a
+    match inside an overlap is counted by one window only.
+    """
+    if not segments or window_seconds <= 0:
+        return []
+    step = max(window_seconds - overlap, 1)
+    built = []
+    first = 0
+    previous = None
+    window_start = segments[0]["start"]
+    last_start = segments[-1]["start"]
+
+    while window_start <= last_start:
+        while first < len(segments) and segments[first]["start"] < window_start:
+            first += 1
+        stop = first
+        while stop < len(segments) and segments[stop]["start"] < window_start + window_seconds:
+            stop += 1
+        if stop > first:
+            if (first, stop) != previous:
+                built.append([segments[first:stop], window_start + step])
+                previous = (first, stop)
+            else:
+                # Same segments again: the window already built owns this range too
+                built[-1][1] = window_start + step
+        window_start += step
+
+    windows = []
+    for chunk, owned_until in built:
+        texts = [seg["text"] for seg in chunk]
+        owned = sum(1 for seg in chunk if seg["start"] < owned_until)
+        end = chunk[-1]["start"] + chunk[-1]["duration"]
+        windows.append({
+            "text": " ".join(texts),
+            "start": chunk[0]["start"],
+            "duration": round(end - chunk[0]["start"], 3),
+            "owned_chars": len(" ".join(texts[:owned]))
+        })
+    return windows
+
+
+def window_owns_match(window, highlighted):
+    """
+    True if a highlighted window has a match in the part it owns. Windows
+    built before owned_chars existed, and highlights without marks, count.
+    """
+    owned_chars = window.get("owned_chars")
+    if owned_chars is None:
+        return True
+    removed = 0
+    found = False
+    for match in _MARK_RE.finditer(highlighted):
+        found = True
+        if match.start() - removed < owned_chars:
+            return True
+        removed += len("<mark>") + len("</mark>")
+    return not found
@@ -1,34 +1,45 @@
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
-from youtube_transcript_api.proxies import WebshareProxyConfig
-from app.auth import build_youtube_client, API_SERVICE_NAME, API_VERSION
-import googleapiclient.discovery
+from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+from app.auth import build_youtube_client, build_client_for_credentials, get_credentials
 from google.oauth2.credentials import Credentials
 from app import app 
+from app.fetcher import get_fetcher_pool
+from app.cache import get_cached_transcript, set_cached_transcript, execute_with_etag
+from app.ratelimit import fetch_slot
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def _user_scope(credentials):
+    """Cache scope for mine=True listings, stable across access-token refreshes."""
+    secret = credentials.refresh_token or credentials.token or ""
+    return hashlib.sha1(secret.encode('utf-8')).hexdigest()
 
 def get_user_playlists():
     """Get all playlists for the authenticated user."""
     youtube = build_youtube_client()
     if not youtube:
         return []
+    user_scope = _user_scope(get_credentials())
     
     playlists = []
     
     # Add Liked Videos special playlist
     try:
-        channels_response = youtube.channels().list(
+        channels_response = execute_with_etag(youtube.channels().list(
             part="contentDetails",
             mine=True
-        ).execute()
+        ), user_scope)
         
         if channels_response['items']:
             channel = channels_response['items'][0]
             user_channel_id = channel['id']
             liked_playlist_id = channel['contentDetails']['relatedPlaylists']['likes']
             
-            liked_videos_response = youtube.playlists().list(
+            liked_videos_response = execute_with_etag(youtube.playlists().list(
                 part="snippet,contentDetails",
                 id=liked_playlist_id
-            ).execute()
+            ), user_scope)
             
             if liked_videos_response['items']:
                 liked_playlist = liked_videos_response['items'][0]
@@ -48,7 +59,7 @@ def get_user_playlists():
             mine=True,
             maxResults=50
         )
-        response = request.execute()
+        response = execute_with_etag(request, user_scope)
         
         for item in response.get('items', []):
             is_own = item['snippet']['channelId'] == user_channel_id
@@ -68,7 +79,7 @@ def get_user_playlists():
                 maxResults=50,
                 pageToken=response['nextPageToken']
             )
-            response = request.execute()
+            response = execute_with_etag(request, user_scope)
             
             for item in response.get('items', []):
                 is_own = item['snippet']['channelId'] == user_channel_id
@@ -86,64 +97,18 @@ def get_user_playlists():
     
     return playlists
 
-def get_playlist_videos(playlist_id, credentials=None):
-    """Get all videos in a playlist."""
-    if credentials:
-        youtube = googleapiclient.discovery.build(
-            API_SERVICE_NAME,
-            API_VERSION,
-            credentials=Credentials(**credentials)
-        )
-    else:
-        youtube = build_youtube_client()
-        
-    if not youtube:
-        return []
-    
-    playlist_items_data = []
-    next_page_token = None
-    
-    while True:
-        request = youtube.playlistItems().list(
-            part="snippet,contentDetails",
-            playlistId=playlist_id,
-            maxResults=50,
-            pageToken=next_page_token
-        )
-        response = request.execute()
-        
-        for item in response.get('items', []):
-            playlist_items_data.append({
-                'item': item,
-                'video_id': item['contentDetails']['videoId']
-            })
-        
-        next_page_token = response.get('nextPageToken')
-        if not next_page_token:
-            break
-    
-    if not playlist_items_data:
-        return [] 
-
-    video_details_map = {}
-    video_ids = [data['video_id'] for data in playlist_items_data]
-    
-    for i in range(0, len(video_ids), 50):
-        chunk = video_ids[i:i+50]
-        
-        video_request = youtube.videos().list(
-            part="snippet,statistics",
-            id=",".join(chunk) 
-        )
-        video_response = video_request.execute()
-        
-        for video_info in video_response.get('items', []):
-            video_details_map[video_info['id']] = video_info
+def _enrich_playlist_items(youtube, items):
+    """Join one playlistItems page with its videos().list details (one call for up to 50 IDs)."""
+    video_ids = [item['contentDetails']['videoId'] for item in items]
+    video_response = execute_with_etag(youtube.videos().list(
+        part="snippet,statistics",
+        id=",".join(video_ids)
+    ))
+    video_details_map = {video_info['id']: video_info for video_info in video_response.get('items', [])}
 
     videos = []
-    for data in playlist_items_data:
-        item = data['item']
-        video_id = data['video_id']
+    for item in items:
+        video_id = item['contentDetails']['videoId']
         video_info = video_details_map.get(video_id)
         
         if video_info:
@@ -156,35 +121,82 @@ def get_playlist_videos(playlist_id, credentials=None):
                 'publishedAt': item['snippet']['publishedAt'],
                 'viewCount': video_info['statistics'].get('viewCount', '0')
             })
-    
     return videos
 
-def get_video_transcript(video_id):
-    """Get transcript for a video using Webshare proxies."""
-    
-    username = app.config.get('WEBSHARE_PROXY_USERNAME')
-    password = app.config.get('WEBSHARE_PROXY_PASSWORD')
+def iter_playlist_video_pages(playlist_id, credentials=None):
+    """
+    Yield (videos, total_results) for each playlistItems page, in playlist order.
 
-    proxy_config_obj = None
-    
-    if username and password:
-        proxy_config_obj = WebshareProxyConfig(
-            proxy_username=username,
-            proxy_password=password
-        )
+    Detail lookups run in a bounded thread pool while the next page is being
+    listed, so callers can start working on early pages before the listing
+    ends. googleapiclient clients (and their httplib2 connections) are not
+    thread-safe, so each worker thread binds its own.
+    """
+    # Resolve credentials here: the detail lookups run in worker threads
+    # outside the request context, where the session is not available.
+    credentials = Credentials(**credentials) if credentials else get_credentials()
+    if not credentials:
+        return
+    youtube = build_client_for_credentials(credentials)
+    local = threading.local()
+
+    def enrich(items):
+        if not hasattr(local, 'youtube'):
+            local.youtube = build_client_for_credentials(credentials)
+        return _enrich_playlist_items(local.youtube, items)
+
+    pending = deque()
+    total_results = 0
+    next_page_token = None
+    with ThreadPoolExecutor(max_workers=max(app.config['YOUTUBE_DETAILS_CONCURRENCY'], 1)) as executor:
+        while True:
+            request = youtube.playlistItems().list(
+                part="snippet,contentDetails",
+                playlistId=playlist_id,
+                maxResults=50,
+                pageToken=next_page_token
+            )
+            response = execute_with_etag(request)
+            total_results = response.get('pageInfo', {}).get('totalResults', total_results)
+
+            items = response.get('items', [])
+            if items:
+                pending.append(executor.submit(enrich, items))
+            while pending and pending[0].done():
+                yield pending.popleft().result(), total_results
+
+            next_page_token = response.get('nextPageToken')
+            if not next_page_token:
+                break
+
+        while pending:
+            yield pending.popleft().result(), total_results
+
+def get_video_transcript(video_id, language="en"):
+    """
+    Get transcript for a video, consulting the shared transcript cache before
+    the worker's pooled, keep-alive fetcher. Network fetches hold a slot of
+    the shared adaptive limiter.
+    """
+    found, cached_segments = get_cached_transcript(video_id, language)
+    if found:
+        return cached_segments
 
     try:
-        ytt_api = YouTubeTranscriptApi(proxy_config=proxy_config_obj)
-        transcript_obj = ytt_api.fetch(video_id)
-        return transcript_obj.to_raw_data()
+        with fetch_slot():
+            transcript = get_fetcher_pool().fetch(video_id, languages=(language,))
+        set_cached_transcript(video_id, transcript, language)
+        return transcript
 
-    # --- VALID "EMPTY" CASES (Return empty list) ---
+    # --- VALID "EMPTY" CASES (Return empty list, cached with a short TTL) ---
     except (TranscriptsDisabled, NoTranscriptFound):
         print(f"Video {video_id} has no transcript. Indexing metadata only.")
+        set_cached_transcript(video_id, [], language, negative=True)
         return [] 
         
     except VideoUnavailable:
         print(f"Video {video_id} is unavailable. Skipping.")
+        set_cached_transcript(video_id, [], language, negative=True)
         return [] 
 
     # --- ERROR CASES (Raise exception to trigger Retry) ---
@@ -25,6 +25,88 @@ class Config:
     WEBSHARE_PROXY_USERNAME = os.environ.get('WEBSHARE_PROXY_USERNAME')
     WEBSHARE_PROXY_PASSWORD = os.environ.get('WEBSHARE_PROXY_PASSWORD')
 
+    # Transcript fetcher pool (per worker process)
+    TRANSCRIPT_POOL_SIZE = int(os.environ.get('TRANSCRIPT_POOL_SIZE', 50))
+    TRANSCRIPT_CONNECTIONS_PER_SESSION = int(os.environ.get('TRANSCRIPT_CONNECTIONS_PER_SESSION', 4))
+    TRANSCRIPT_KEEP_ALIVE = os.environ.get('TRANSCRIPT_KEEP_ALIVE', 'True').lower() == 'true'
+    TRANSCRIPT_STATS_EVERY = int(os.environ.get('TRANSCRIPT_STATS_EVERY', 25))
+
+    # Adaptive (AIMD) transcript fetch concurrency shared by all workers
+    FETCH_LIMITER_ENABLED = os.environ.get('FETCH_LIMITER_ENABLED', 'True').lower() == 'true'
+    FETCH_LIMIT_INITIAL = float(os.environ.get('FETCH_LIMIT_INITIAL', 20))
+    FETCH_LIMIT_MIN = float(os.environ.get('FETCH_LIMIT_MIN', 2))
+    FETCH_LIMIT_MAX = float(os.environ.get('FETCH_LIMIT_MAX', 100))
+    FETCH_LIMIT_INCREASE = float(os.environ.get('FETCH_LIMIT_INCREASE', 1))
+    FETCH_LIMIT_DECREASE_FACTOR = float(os.environ.get('FETCH_LIMIT_DECREASE_FACTOR', 0.5))
+    FETCH_LIMIT_COOLDOWN = int(os.environ.get('FETCH_LIMIT_COOLDOWN', 5))
+    FETCH_LATENCY_TARGET = float(os.environ.get('FETCH_LATENCY_TARGET', 8.0))
+    FETCH_LEASE_SECONDS = int(os.environ.get('FETCH_LEASE_SECONDS', 120))
+    FETCH_ACQUIRE_TIMEOUT = float(os.environ.get('FETCH_ACQUIRE_TIMEOUT', 300))
+    RETRY_BACKOFF_BASE = float(os.environ.get('RETRY_BACKOFF_BASE', 2))
+    RETRY_BACKOFF_MAX = float(os.environ.get('RETRY_BACKOFF_MAX', 120))
+
+    # Shared transcript cache (gzip-compressed in Redis, keyed by video and language)
+    TRANSCRIPT_CACHE_ENABLED = os.environ.get('TRANSCRIPT_CACHE_ENABLED', 'True').lower() == 'true'
+    TRANSCRIPT_CACHE_TTL = int(os.environ.get('TRANSCRIPT_CACHE_TTL', 30 * 24 * 3600))
+    TRANSCRIPT_CACHE_NEGATIVE_TTL = int(os.environ.get('TRANSCRIPT_CACHE_NEGATIVE_TTL', 24 * 3600))
+    TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get('TRANSCRIPT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+    # YouTube Data API list responses, revalidated with If-None-Match on every use
+    YOUTUBE_CACHE_ENABLED = os.environ.get('YOUTUBE_CACHE_ENABLED', 'True').lower() == 'true'
+    YOUTUBE_CACHE_TTL = int(os.environ.get('YOUTUBE_CACHE_TTL', 7 * 24 * 3600))
+    # Parallel videos().list calls (50 IDs each) while listing a playlist
+    YOUTUBE_DETAILS_CONCURRENCY = int(os.environ.get('YOUTUBE_DETAILS_CONCURRENCY', 8))
+
+    # Bulk indexing (shared buffer per worker process)
+    BULK_FLUSH_DOCS = int(os.environ.get('BULK_FLUSH_DOCS', 200))
+    BULK_FLUSH_BYTES = int(os.environ.get('BULK_FLUSH_BYTES', 10 * 1024 * 1024))
+    BULK_FLUSH_INTERVAL = float(os.environ.get('BULK_FLUSH_INTERVAL', 2.0))
+    BULK_WAIT_TIMEOUT = float(os.environ.get('BULK_WAIT_TIMEOUT', 120.0))
+
+    # Videos per Celery task (1 = one process_video_task per video) and how
+    # many transcripts a batch task fetches at once
+    INDEX_BATCH_SIZE = int(os.environ.get('INDEX_BATCH_SIZE', 1))
+    BATCH_FETCH_CONCURRENCY = int(os.environ.get('BATCH_FETCH_CONCURRENCY', 10))
+
+    # Transcript storage for new indexes: 'nested' (segments inside the video
+    # document) or 'segments' (flat documents in a separate segments_<id> index)
+    TRANSCRIPT_STORAGE = os.environ.get('TRANSCRIPT_STORAGE', 'nested').lower()
+    SEGMENT_WINDOW_SIZE = int(os.environ.get('SEGMENT_WINDOW_SIZE', 1))
+    # Overlapping time windows searched instead of raw caption segments in
+    # 'nested' storage, so phrases spanning two captions match (0 disables)
+    TRANSCRIPT_WINDOW_SECONDS = float(os.environ.get('TRANSCRIPT_WINDOW_SECONDS', 30))
+    TRANSCRIPT_WINDOW_OVERLAP = float(os.environ.get('TRANSCRIPT_WINDOW_OVERLAP', 10))
+    # Mapping profile for new indexes: 'standard' or 'compact' (transcript
+    # text kept once in _source, unqueried fields not indexed); compare with
+    # `flask storage-report <playlist_id>`
+    INDEX_MAPPING_PROFILE = os.environ.get('INDEX_MAPPING_PROFILE', 'standard').lower()
+    # How new nested-storage indexes answer transcript hits: 'nested' (inner
+    # hits on segments/windows) or 'offsets' (flat full-text highlight mapped
+    # back to timestamps through a stored offset timeline)
+    TRANSCRIPT_MATCH_MODE = os.environ.get('TRANSCRIPT_MATCH_MODE', 'nested').lower()
+    # Frequent transcript phrases indexed per video for /suggest completions
+    SUGGEST_PHRASES_PER_VIDEO = int(os.environ.get('SUGGEST_PHRASES_PER_VIDEO', 20))
+    # Transcript matches returned per video with search results; the rest is
+    # paged from /api/playlist/<id>/video/<video_id>/matches
+    SEARCH_PREVIEW_MATCHES = int(os.environ.get('SEARCH_PREVIEW_MATCHES', 3))
+
+    # Index layout for new playlists: 'per_playlist' (one playlist_<id> index
+    # each) or 'shared' (routed yts_videos_<n> indexes behind playlist_<id> aliases)
+    INDEX_LAYOUT = os.environ.get('INDEX_LAYOUT', 'per_playlist').lower()
+    SHARED_INDEX_COUNT = int(os.environ.get('SHARED_INDEX_COUNT', 2))
+    SHARED_INDEX_SHARDS = int(os.environ.get('SHARED_INDEX_SHARDS', 3))
+
+    # Copy videos already indexed in another playlist instead of refetching them
+    DEDUPE_ACROSS_PLAYLISTS = os.environ.get('DEDUPE_ACROSS_PLAYLISTS', 'True').lower() == 'true'
+
+    # Search result cache (Redis)
+    SEARCH_CACHE_ENABLED = os.environ.get('SEARCH_CACHE_ENABLED', 'True').lower() == 'true'
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 600))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', 200))
+    # Cursor paging (?cursor=): how long a point in time and its cursor stay
+    # alive between page requests
+    SEARCH_CURSOR_TTL = int(os.environ.get('SEARCH_CURSOR_TTL', 300))
+
     # Frontend URL (for CORS)
     FRONTEND_URL = os.environ.get('FRONTEND_URL') or "http://localhost:3000"
 
@@ -41,4 +123,7 @@ class Config:
     # Celery
     CELERY_BROKER_URL = REDIS_URL
     RESULT_BACKEND = REDIS_URL
+    # index_playlist_task acks late; the Redis broker hands an unacked task to
+    # another worker after this many seconds, so it must outlast the longest run
+    CELERY_VISIBILITY_TIMEOUT = int(os.environ.get('CELERY_VISIBILITY_TIMEOUT', 24 * 3600))
     PRODUCTION = os.environ.get('PRODUCTION', 'False').lower() == 'true'
\ No newline at end of file
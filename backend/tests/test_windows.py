@@ -0,0 +1,48 @@
+import importlib.util
+from pathlib import Path
+
+# Loaded by path: importing the app package connects to Elasticsearch and Redis
+_spec = importlib.util.spec_from_file_location("windows", Path(__file__).resolve().parent.parent / "app" / "windows.py")
+windows = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(windows)
+
+
+def _segments(texts_by_start, duration=3):
+    return [{"text": text, "start": start, "duration": duration} for start, text in texts_by_start]
+
+
+def _highlight(window, word):
+    return window["text"].replace(word, f"<mark>{word}</mark>")
+
+
+def _owned_matches(segments, word, window_seconds=30, overlap=10):
+    built = windows.build_transcript_windows(segments, window_seconds, overlap)
+    return [
+        window["start"] for window in built
+        if word in window["text"] and windows.window_owns_match(window, _highlight(window, word))
+    ]
+
+
+def test_matches_in_neighbouring_windows_are_both_kept():
+    segments = _segments([(start, "apple pie" if start in (6, 36) else "filler words") for start in range(0, 60, 3)])
+    # t=6 lies in the first window, t=36 in the second only (windows start at 0s, 21s, 42s)
+    assert _owned_matches(segments, "apple") == [0, 21]
+
+
+def test_match_in_an_overlap_is_counted_once():
+    segments = _segments([(start, "apple pie" if start == 24 else "filler words") for start in range(0, 60, 3)])
+    # t=24 is in the windows from 0s and 21s; the one from 21s owns it
+    assert _owned_matches(segments, "apple") == [21]
+
+
+def test_repeated_window_range_falls_to_the_window_kept():
+    # A long silence makes the windows from 20s and 40s hold the same segment
+    segments = _segments([(0, "intro"), (45, "apple pie")])
+    built = windows.build_transcript_windows(segments, 30, 10)
+    assert [window["start"] for window in built] == [0, 45]
+    assert _owned_matches(segments, "apple") == [45]
+
+
+def test_windows_without_owned_chars_always_count():
+    window = {"text": "apple pie", "start": 0, "duration": 3}
+    assert windows.window_owns_match(window, "<mark>apple</mark> pie")
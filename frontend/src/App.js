@@ -12,6 +12,7 @@ import {
   getIndexedPlaylists,
   deletePlaylistIndex,
   getIndexingStatus,
+  subscribeIndexingProgress,
   getAuthStatus,
   cancelIndexing,
 } from './services/api';
@@ -133,12 +134,43 @@ function App() {
 
   }, [indexingPlaylists]);
 
+  // Progress is pushed over SSE; polling only remains as a slow fallback
+  // and to pick up the final status once a run ends.
+  const indexingIds = indexingPlaylists.map(p => p.id).join(',');
+
+  useEffect(() => {
+    if (!indexingIds) return;
+
+    const sources = indexingIds.split(',').map(playlistId =>
+      subscribeIndexingProgress(playlistId, (event) => {
+        if (['completed', 'failed', 'cancelled'].includes(event.status)) {
+          checkAllIndexingStatuses();
+          return;
+        }
+        setIndexingPlaylists(prev => prev.map(p => (
+          p.id === playlistId
+            ? {
+                ...p,
+                status: event.status || p.status,
+                progress: event.progress ?? p.progress,
+                total: event.total || p.total,
+                message: event.message || p.message
+              }
+            : p
+        )));
+      })
+    );
+
+    return () => sources.forEach(source => source.close());
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [indexingIds]);
+
   useEffect(() => {
     if (indexingPlaylists.length === 0) return;
 
     const interval = setInterval(() => {
       checkAllIndexingStatuses();
-    }, 3000);
+    }, 15000);
 
     return () => clearInterval(interval);
   }, [indexingPlaylists, checkAllIndexingStatuses]);
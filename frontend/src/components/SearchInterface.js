@@ -1,5 +1,5 @@
-import React, { useState } from 'react';
-import { searchPlaylist, exportPlaylistData } from '../services/api';
+import React, { useState, useEffect } from 'react';
+import { searchPlaylist, exportPlaylistData, getSuggestions } from '../services/api';
 import VideoResults from './VideoResults';
 import LoadingScreen from './LoadingScreen';
 
@@ -21,6 +21,31 @@ const SearchInterface = ({ playlist, onDeleteIndex, onReindex, isIndexing }) =>
   const [pendingChannelSearch, setPendingChannelSearch] = useState(false);
   const resultsPerPage = 10;
   const [pageInput, setPageInput] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
+  // Query the current results were found with (the input may have changed since)
+  const [resultsQuery, setResultsQuery] = useState('');
+
+  // Debounced completions for the search box
+  useEffect(() => {
+    const prefix = query.trim();
+    if (prefix.length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await getSuggestions(playlist.id, prefix);
+        if (!cancelled) setSuggestions(response.data.suggestions || []);
+      } catch (error) {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query, playlist.id]);
 
   const handleSearch = async (e, page = 1, channelFilters = selectedChannels) => {
     if (e) e.preventDefault();
@@ -44,13 +69,17 @@ const SearchInterface = ({ playlist, onDeleteIndex, onReindex, isIndexing }) =>
       
       setResults(response.data.results || []);
       setTotalResults(response.data.total || 0);
+      setResultsQuery(query);
       setCurrentPage(page);
       setSearchPerformed(true);
       
       // Sync page input with current page
       setPageInput(page.toString());
       
-      setChannelsInResults(response.data.channels || []);
+      // Channel facets are only computed for the first page
+      if (page === 1) {
+        setChannelsInResults(response.data.channels || []);
+      }
     } catch (error) {
       console.error('Search error:', error);
       setError(error.response?.data?.error || 'Failed to perform search');
@@ -153,7 +182,14 @@ const SearchInterface = ({ playlist, onDeleteIndex, onReindex, isIndexing }) =>
             onChange={(e) => setQuery(e.target.value)}
             placeholder="Search in playlist..."
             className="search-input"
+            list="search-suggestions"
+            autoComplete="off"
           />
+          <datalist id="search-suggestions">
+            {suggestions.map((suggestion) => (
+              <option key={suggestion} value={suggestion} />
+            ))}
+          </datalist>
           <button type="submit" className="search-button" disabled={loading}>
             Search
           </button>
@@ -248,7 +284,7 @@ const SearchInterface = ({ playlist, onDeleteIndex, onReindex, isIndexing }) =>
                 </div>
               )}
 
-              <VideoResults results={results} query={query} />
+              <VideoResults results={results} playlistId={playlist.id} query={resultsQuery} />
               
               {totalPages > 1 && (
                 <div className="pagination">
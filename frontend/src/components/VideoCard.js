@@ -1,5 +1,6 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import DOMPurify from 'dompurify';
+import { getVideoMatches } from '../services/api';
 
 // Helper function to format timestamp (e.g., 125.5 -> 2:05)
 const formatTimestamp = (seconds) => {
@@ -15,7 +16,32 @@ const createMarkup = (html) => {
   return { __html: DOMPurify.sanitize(html) };
 };
 
-const VideoCard = ({ video }) => {
+const VideoCard = ({ video, playlistId, query }) => {
+  // Search returns a preview of the matches; the rest is fetched on demand
+  const [segments, setSegments] = useState(video.matching_segments || []);
+  const [loadingMatches, setLoadingMatches] = useState(false);
+  const [matchCount, setMatchCount] = useState(video.match_count || 0);
+
+  useEffect(() => {
+    setSegments(video.matching_segments || []);
+    setMatchCount(video.match_count || 0);
+  }, [video]);
+
+  const loadMoreMatches = async () => {
+    setLoadingMatches(true);
+    try {
+      const response = await getVideoMatches(playlistId, video.id, query, segments.length);
+      const matches = response.data.matches || [];
+      setSegments(prev => [...prev, ...matches]);
+      // The server caps how far matches can be paged; stop offering more there
+      setMatchCount(matches.length ? response.data.total : segments.length);
+    } catch (error) {
+      console.error('Failed to load more matches:', error);
+    } finally {
+      setLoadingMatches(false);
+    }
+  };
+
   // Determine the primary link URL (first matching segment or start of video)
   const primaryTimestamp = video.matching_segments?.[0]?.start || 0;
   const videoUrl = `https://youtube.com/watch?v=${video.id}&t=${Math.floor(primaryTimestamp)}`;
@@ -63,9 +89,9 @@ const VideoCard = ({ video }) => {
           </div>
         )}
 
-        {video.matching_segments && video.matching_segments.length > 0 && (
+        {segments.length > 0 && (
           <div className="video-transcript-matches">
-            {video.matching_segments.map((segment, i) => (
+            {segments.map((segment, i) => (
               <div key={i} className="video-transcript-segment">
                 <div
                   dangerouslySetInnerHTML={createMarkup(
@@ -84,6 +110,18 @@ const VideoCard = ({ video }) => {
                 </a>
               </div>
             ))}
+            {playlistId && segments.length < matchCount && (
+              <button
+                type="button"
+                onClick={loadMoreMatches}
+                disabled={loadingMatches}
+                className="pagination-button more-matches-button"
+              >
+                {loadingMatches
+                  ? 'Loading...'
+                  : `Show more matches (${matchCount - segments.length})`}
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -1,7 +1,7 @@
 import React from 'react';
 import VideoCard from './VideoCard'; // Import the refactored VideoCard
 
-const VideoResults = ({ results }) => {
+const VideoResults = ({ results, playlistId, query }) => {
   return (
     <div className="video-results">
       {results.map((video, index) => (
@@ -9,6 +9,8 @@ const VideoResults = ({ results }) => {
           // Use a unique key for each item
           key={`${video.id}-${index}`}
           video={video}
+          playlistId={playlistId}
+          query={query}
         />
       ))}
     </div>
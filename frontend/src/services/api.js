@@ -39,6 +39,19 @@ export const indexPlaylist = (playlistId, title, incremental = false, force = fa
 // ------------------------------------
 
 export const getIndexingStatus = (playlistId) => api.get(`/indexing-status?playlist_id=${playlistId}`);
+
+// Server-Sent Events: pushes progress as workers finish videos
+export const subscribeIndexingProgress = (playlistId, onEvent) => {
+  const source = new EventSource(`${API_URL}/playlist/${playlistId}/progress-stream`, { withCredentials: true });
+  source.onmessage = (event) => {
+    try {
+      onEvent(JSON.parse(event.data));
+    } catch (error) {
+      console.error('Bad progress event:', error);
+    }
+  };
+  return source;
+};
 export const cancelIndexing = (playlistId) => api.post(`/playlist/${playlistId}/cancel-index`);
 
 export const deletePlaylistIndex = (playlistId) => api.delete(`/playlist/${playlistId}/delete-index`);
@@ -58,8 +71,46 @@ export const searchPlaylist = (playlistId, query, searchIn = ['title', 'descript
   return api.get(`/playlist/${playlistId}/search?${params.toString()}`);
 };
 
-export const exportPlaylistData = (playlistId) => {
-  window.open(`${API_URL}/playlist/${playlistId}/export`);
+// Cursor paging: pass cursor = '' to start and the returned cursor for each next page
+export const searchPlaylistWithCursor = (playlistId, query, searchIn = ['title', 'description', 'transcript'], size = 10, channels = [], cursor = '') => {
+  const params = new URLSearchParams();
+  params.append('cursor', cursor);
+  if (!cursor) {
+    params.append('q', query);
+    params.append('size', size);
+    searchIn.forEach(field => params.append('search_in', field));
+    channels.forEach(channel => params.append('channel', channel));
+  }
+
+  return api.get(`/playlist/${playlistId}/search?${params.toString()}`);
+};
+
+// Searches every indexed playlist of the signed-in user at once
+export const searchAllPlaylists = (query, searchIn = ['title', 'description', 'transcript'], page = 1, size = 10, channels = []) => {
+  const params = new URLSearchParams();
+  params.append('q', query);
+  params.append('page', page);
+  params.append('size', size);
+  searchIn.forEach(field => params.append('search_in', field));
+  channels.forEach(channel => params.append('channel', channel));
+
+  return api.get(`/search?${params.toString()}`);
+};
+
+export const getSuggestions = (playlistId, prefix, size = 8) => {
+  const params = new URLSearchParams({ q: prefix, size });
+  return api.get(`/playlist/${playlistId}/suggest?${params.toString()}`);
+};
+
+// Pages through one result's transcript matches past the preview returned by search
+export const getVideoMatches = (playlistId, videoId, query, offset = 0, size = 20) => {
+  const params = new URLSearchParams({ q: query, offset, size });
+  return api.get(`/playlist/${playlistId}/video/${videoId}/matches?${params.toString()}`);
+};
+
+export const exportPlaylistData = (playlistId, format = 'json', gzip = false) => {
+  const params = new URLSearchParams({ format, gzip: gzip ? '1' : '0' });
+  window.open(`${API_URL}/playlist/${playlistId}/export?${params.toString()}`);
 };
 
 export default api;
\ No newline at end of file